@@ -0,0 +1,247 @@
+from __future__ import annotations
+import argparse
+import ast
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from ..config import load_spec
+from ..layout import build_doc_flow
+from ..mappings import ROOT
+from ..parser import parse_orders
+from ..pdfout import build_pdf_flow
+from ..transform import rows_to_labels
+from .synth import SYNTH_VERSION, make_order_pdf
+
+DEFAULT_SCALES = (10, 50, 200)   # pages per synthetic order PDF
+DEFAULT_SEED = 1
+DEFAULT_TOLERANCE = 0.25         # slower than baseline by more than this = regression
+DEFAULT_CONFIG = ROOT / "templates" / "label_config.yaml"
+GOLDEN_PATH = Path(__file__).with_name("golden.json")
+REPORT_SCHEMA = 1
+
+# hand-made expected outputs in the repo root: parse rows -> labels
+REPO_FIXTURES = (("toneri_1_parse.txt", "toner_1_labels.txt"),
+                 ("toneri_2_parse.txt", "toner_2_labels.txt"))
+
+def _digest(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _best(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    # best-of-N wall time, and the result of the last call
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+def _reset(d: Dict[str, Any]) -> Dict[str, Any]:
+    d.clear()
+    return d
+
+def _synth_name(pages: int) -> str:
+    return f"synth_{pages}p"
+
+def _synth_pdf(work_dir: str, pages: int, seed: int) -> str:
+    path = os.path.join(work_dir, f"{_synth_name(pages)}-s{seed}-v{SYNTH_VERSION}.pdf")
+    if not os.path.exists(path):
+        make_order_pdf(path, pages, seed=seed + pages, cover_every=7)
+    return path
+
+# --- golden fixtures ---
+
+def check_repo_fixtures(root: Path = ROOT) -> List[Dict[str, Any]]:
+    """
+    rows_to_labels on each hand-made toneri_*_parse.txt vs its toner_*_labels.txt.
+    These describe the target output, which the pipeline does not fully reach yet,
+    so they are reported (matched label count) but never gate the run.
+    """
+    out = []
+    for rows_name, labels_name in REPO_FIXTURES:
+        rows_path, labels_path = root / rows_name, root / labels_name
+        if not rows_path.exists() or not labels_path.exists():
+            continue
+        rows = json.loads(rows_path.read_text(encoding="utf-8"))
+        expected = ast.literal_eval(labels_path.read_text(encoding="utf-8"))
+        got = rows_to_labels(rows)
+        key = lambda d: tuple(sorted(d.items()))
+        matched = sum((Counter(map(key, got)) & Counter(map(key, expected))).values())
+        out.append({"fixture": labels_name, "gate": False, "ok": got == expected,
+                    "expected": len(expected), "got": len(got), "matched": matched})
+    return out
+
+def _load_golden(path: Path = GOLDEN_PATH) -> Dict[str, Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def check_golden(name: str, seed: int, rows, labels,
+                 golden: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Synthetic PDF outputs vs the digests recorded in golden.json (None if not recorded)."""
+    want = golden.get(name)
+    if want is None or want.get("seed") != seed:
+        return None
+    rows_ok = _digest(rows) == want["rows_sha256"]
+    labels_ok = _digest(labels) == want["labels_sha256"]
+    return {"fixture": name, "gate": True, "ok": rows_ok and labels_ok,
+            "rows_ok": rows_ok, "labels_ok": labels_ok,
+            "expected": want["labels"], "got": len(labels)}
+
+# --- benchmark ---
+
+def run_benchmark(scales: Iterable[int] = DEFAULT_SCALES, config_path=DEFAULT_CONFIG,
+                  repeat: int = 3, seed: int = DEFAULT_SEED, work_dir: Optional[str] = None,
+                  update_golden: bool = False) -> Dict[str, Any]:
+    """
+    Time parse_orders, rows_to_labels, build_pdf_flow and build_doc_flow
+    separately on a synthetic order PDF per scale (best of `repeat` runs),
+    and check outputs against the golden fixtures.
+    Returns the report dict (see finish_report); synthetic PDFs are kept in
+    work_dir between runs, so only the first run pays for generating them.
+    update_golden=True records the current outputs as the new golden digests.
+    """
+    spec = load_spec(str(config_path))
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), "sticker_bench")
+    os.makedirs(work_dir, exist_ok=True)
+    golden = _load_golden()
+
+    results, checks = [], []
+    for pages in scales:
+        pdf = _synth_pdf(work_dir, pages, seed)
+        name = _synth_name(pages)
+        out = os.path.join(work_dir, name)
+
+        stats: Dict[str, int] = {}
+        t, rows = _best(lambda: parse_orders(pdf, stats=_reset(stats)), repeat)
+        results.append({"stage": "parse_orders", "pages": pages, "rows": len(rows),
+                        "pages_skipped": stats.get("pages_skipped", 0),
+                        "seconds": t, "per_s": pages / t, "unit": "pages"})
+        t, labels = _best(lambda: rows_to_labels(rows), repeat)
+        results.append({"stage": "rows_to_labels", "pages": pages, "rows": len(rows),
+                        "labels": len(labels), "seconds": t, "per_s": len(labels) / t, "unit": "labels"})
+        for stage, fn, ext in (("build_pdf_flow", build_pdf_flow, "pdf"),
+                               ("build_doc_flow", build_doc_flow, "docx")):
+            t, _ = _best(lambda: fn(labels, spec, f"{out}.{ext}"), repeat)
+            results.append({"stage": stage, "pages": pages, "labels": len(labels),
+                            "seconds": t, "per_s": len(labels) / t, "unit": "labels",
+                            "bytes": os.path.getsize(f"{out}.{ext}")})
+
+        if update_golden:
+            golden[name] = {"pages": pages, "seed": seed, "rows": len(rows), "labels": len(labels),
+                            "rows_sha256": _digest(rows), "labels_sha256": _digest(labels)}
+        check = check_golden(name, seed, rows, labels, golden)
+        if check:
+            checks.append(check)
+
+    if update_golden:
+        GOLDEN_PATH.write_text(json.dumps(golden, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+    return {
+        "schema": REPORT_SCHEMA,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(), "seed": seed, "repeat": repeat, "scales": list(scales),
+        "results": results,
+        "golden": checks + check_repo_fixtures(),
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE,
+            thresholds: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Regressions of report against a baseline report: every (stage, pages)
+    present in both whose time grew by more than its tolerance
+    (thresholds[stage], else tolerance).
+    """
+    thresholds = thresholds or {}
+    base = {(r["stage"], r["pages"]): r for r in baseline.get("results", [])}
+    out = []
+    for r in report["results"]:
+        b = base.get((r["stage"], r["pages"]))
+        if b is None:
+            continue
+        limit = thresholds.get(r["stage"], tolerance)
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else 1.0
+        if ratio > 1.0 + limit:
+            out.append({"stage": r["stage"], "pages": r["pages"], "seconds": r["seconds"],
+                        "baseline_seconds": b["seconds"], "ratio": ratio, "tolerance": limit})
+    return out
+
+def finish_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None,
+                  tolerance: float = DEFAULT_TOLERANCE,
+                  thresholds: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Add thresholds, regressions and the overall ok flag (no regression, gating golden checks pass)."""
+    report["thresholds"] = {"default": tolerance, **(thresholds or {})}
+    report["regressions"] = compare(report, baseline, tolerance, thresholds) if baseline else []
+    report["ok"] = not report["regressions"] and all(g["ok"] for g in report["golden"] if g["gate"])
+    return report
+
+# --- CLI ---
+
+def _parse_thresholds(items: Iterable[str]) -> Dict[str, float]:
+    out = {}
+    for item in items:
+        stage, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"bad threshold {item!r} (expected STAGE=FRACTION)")
+        out[stage.strip()] = float(value)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="sticker_maker bench",
+                                 description="time parse / labels / PDF / DOCX on synthetic order PDFs")
+    ap.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)), help="pages per PDF, e.g. 10,50,200")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per stage, best time is kept")
+    ap.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    ap.add_argument("--config", default=str(DEFAULT_CONFIG))
+    ap.add_argument("--work-dir", default=None, help="where synthetic PDFs and outputs are kept")
+    ap.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    ap.add_argument("--baseline", default=None, help="earlier report to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="allowed slowdown vs baseline, as a fraction (0.25 = 25%%)")
+    ap.add_argument("--threshold", action="append", default=[], metavar="STAGE=FRACTION",
+                    help="per-stage tolerance, e.g. build_doc_flow=0.5; repeatable")
+    ap.add_argument("--update-golden", action="store_true", help="record current outputs as golden")
+    args = ap.parse_args(argv)
+
+    try:
+        scales = [int(s) for s in args.scales.split(",") if s.strip()]
+        thresholds = _parse_thresholds(args.threshold)
+    except ValueError as e:
+        ap.error(str(e))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_benchmark(scales, args.config, args.repeat, args.seed, args.work_dir, args.update_golden)
+    finish_report(report, baseline, args.tolerance, thresholds)
+
+    for r in report["results"]:
+        print(f"{r['stage']:<15} {r['pages']:>5}p {r['seconds'] * 1000:>10.1f} ms "
+              f"{r['per_s']:>10.0f} {r['unit']}/s", file=sys.stderr)
+    for g in report["golden"]:
+        state = "ok" if g["ok"] else ("FAIL" if g["gate"] else "differs")
+        extra = f" ({g['matched']}/{g['expected']} labels match)" if "matched" in g else ""
+        print(f"golden {g['fixture']}: {state}{extra}", file=sys.stderr)
+    for r in report["regressions"]:
+        print(f"REGRESSION {r['stage']} {r['pages']}p: {r['ratio']:.2f}x baseline "
+              f"(tolerance {r['tolerance']:.0%})", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if not report["ok"]:
+        sys.exit(1)
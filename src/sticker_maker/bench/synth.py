@@ -0,0 +1,127 @@
+from __future__ import annotations
+import random
+from typing import Iterable, List, Optional
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+# bump when the generated documents change; part of cached benchmark PDF names
+SYNTH_VERSION = 1
+
+# what real orders contain: raw location names, printer models, product / komplet cells, rooms
+LOCATIONS = ["GRADSKA UPRAVA", "Avenija Dubrovnik 10", "PODRUČNI URED ČRNOMEREC",
+             "PODRUČNI URED MAKSIMIR", "PODRUČNI URED TREŠNJEVKA", "Remetinec",
+             "Velesajam", "Vlaška", "Branimirova", "Marulićeva", "PODRUČNI URED SESVETE"]
+PRINTERS = ["HP LaserJet Pro M402dn", "HP Color LaserJet Pro M452dw", "HP LaserJet Pro M404dn",
+            "HP LaserJet M401dne", "HP Color LaserJet Enterprise M751dn",
+            "HP Color LaserJet Pro MFP M479fdn", "HP LaserJet MFP 4002dn"]
+PRODUCTS = ["Crna-CF226A", "Black - CF259A", "80A-CF280A", "Crna - W1490A",
+            "komplet-", "komplet CF410", "komplet W2030"]
+ROOMS = [str(n) for n in range(1, 520)] + ["Porta", "Središnja pisarnica"]
+HEADER = ["Pisač", "Boja - šifra", "Soba"]
+
+_ROW_H = 6 * mm
+_COL_W = (78 * mm, 52 * mm, 30 * mm)
+
+def _font() -> str:
+    # Vera ships with reportlab: same glyphs (incl. Č/Ć/Đ) and bytes on every machine
+    if "SynthVera" not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont("SynthVera", "Vera.ttf"))
+    return "SynthVera"
+
+def _order_rows(rnd: random.Random) -> List[List[str]]:
+    # printer | product | room; further products for the same printer leave the printer cell empty
+    rows = []
+    for _ in range(rnd.randint(1, 4)):
+        printer = rnd.choice(PRINTERS)
+        for i in range(rnd.choices((1, 2), (4, 1))[0]):
+            rows.append([printer if i == 0 else "", rnd.choice(PRODUCTS), rnd.choice(ROOMS)])
+    return rows
+
+def make_order_pdf(path: str, pages: int, seed: int = 1, blocks: int = 2,
+                   grid: Optional[bool] = None, cover_every: int = 0,
+                   date: str = "21.10.2025.") -> None:
+    """
+    Write a synthetic order PDF of `pages` pages to path, deterministic for a seed.
+
+    Each page has a 'Datum:' line and up to `blocks` order blocks: a
+    'Lokacija:' line (sometimes with the value spilling onto the next line,
+    sometimes absent so the previous location carries over) followed by a
+    printer / product / room table. In ruled tables long printer models wrap
+    to a second line inside their cell; komplet rows expand to colour packs
+    downstream.
+    grid=True draws ruled tables, False text-only ones, None mixes both.
+    cover_every=N makes every Nth page a table-less cover page.
+    """
+    rnd = random.Random(seed)
+    font = _font()
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)  # byte-stable output for a given seed
+    _, H = A4
+    x0 = 20 * mm
+    for p in range(pages):
+        if cover_every and p % cover_every == cover_every - 1:
+            c.setFont(font, 12)
+            c.drawString(x0, H - 40 * mm, "Uvjeti narudžbe i potpis naručitelja")
+            c.showPage()
+            continue
+        c.setFont(font, 10)
+        y = H - 20 * mm
+        c.drawString(x0, y, f"Datum: {date}")
+        y -= 10 * mm
+        for b in range(blocks):
+            r = rnd.random()
+            loc = rnd.choice(LOCATIONS)
+            if r < 0.15:
+                c.drawString(x0, y, "Lokacija:")  # value on the next line
+                c.drawString(x0, y - 5 * mm, loc)
+                y -= 13 * mm
+            elif r < 0.9:
+                c.drawString(x0, y, f"Lokacija: {loc}")
+                y -= 8 * mm
+            # else: no Lokacija line, the location carries over
+
+            rows = [HEADER] + _order_rows(rnd)
+            ruled = grid if grid is not None else rnd.random() < 0.5
+            wrap = 30 if ruled else 999
+            heights = [_ROW_H * (2 if len(row[0]) > wrap else 1) for row in rows]
+            top = y
+            for row, h in zip(rows, heights):
+                x = x0
+                for ci, v in enumerate(row):
+                    if ci == 0 and len(v) > wrap:
+                        head, _, tail = v.rpartition(" ")  # model wraps inside the cell
+                        c.drawString(x + 1 * mm, y - _ROW_H + 2 * mm, head)
+                        c.drawString(x + 1 * mm, y - 2 * _ROW_H + 2 * mm, tail)
+                    else:
+                        c.drawString(x + 1 * mm, y - _ROW_H + 2 * mm, v)
+                    x += _COL_W[ci]
+                y -= h
+            if ruled:
+                x1 = x0 + sum(_COL_W)
+                yy = top
+                c.line(x0, yy, x1, yy)
+                for h in heights:
+                    yy -= h
+                    c.line(x0, yy, x1, yy)
+                x = x0
+                for w in _COL_W + (0,):
+                    c.line(x, top, x, y)
+                    x += w
+            y -= 12 * mm
+            if y < 60 * mm:
+                break
+        c.showPage()
+    c.save()
+
+def make_corpus(out_dir: str, pages: Iterable[int], seed: int = 1) -> List[str]:
+    """One order PDF per page count (synth_<pages>p.pdf); returns the paths."""
+    import os
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n in pages:
+        path = os.path.join(out_dir, f"synth_{n}p.pdf")
+        make_order_pdf(path, n, seed=seed + n, cover_every=7)
+        paths.append(path)
+    return paths
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from .instrument import count
+from .parser import PARSER_VERSION, parse_orders
+
+# default location: $STICKER_CACHE_DIR or ~/.cache/sticker_maker/parse
+DEFAULT_CACHE_DIR = Path(os.environ.get("STICKER_CACHE_DIR")
+                         or Path.home() / ".cache" / "sticker_maker" / "parse")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class ParseCache:
+    """
+    Cleaned parse_orders rows on disk, one JSON file per PDF:
+      <cache_dir>/<sha256 of PDF bytes>-p<PARSER_VERSION>.json
+
+    LRU by file mtime (bumped on every hit); the directory is trimmed
+    back under max_bytes after each write.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_bytes)
+
+    def _path(self, digest: str) -> Path:
+        return self.dir / f"{digest}-p{PARSER_VERSION}.json"
+
+    def get(self, digest: str) -> Optional[List[Dict[str, Any]]]:
+        path = self._path(digest)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return rows
+
+    def put(self, digest: str, rows: List[Dict[str, Any]]) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # atomic write: concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False)
+            os.replace(tmp, self._path(digest))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for p in self.dir.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()  # oldest first
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+def parse_orders_cached(pdf_path: str, cache: Optional[ParseCache] = None,
+                        workers: int = 1,
+                        stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    parse_orders with a content-addressed cache in front of it.
+    A hit returns the stored rows without opening the PDF in pdfplumber.
+    cache=None disables caching.
+    """
+    if cache is None:
+        return parse_orders(pdf_path, workers, stats)
+
+    digest = file_sha256(pdf_path)
+    rows = cache.get(digest)
+    count("cache.hit" if rows is not None else "cache.miss")
+    if stats is not None:
+        stats["cache_hit"] = int(rows is not None)
+    if rows is not None:
+        return rows
+
+    rows = parse_orders(pdf_path, workers, stats)
+    cache.put(digest, rows)
+    return rows
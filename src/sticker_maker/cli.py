@@ -1,20 +1,219 @@
-import argparse, os
-from .generate import generate_dummy_flow
+import argparse, contextlib, json, os, sys
+from .config import load_spec
+from .generate import DEFAULT_FORMATS, generate_dummy_flow, parse_formats
 
-def main():
-    ap = argparse.ArgumentParser(description="Zebra-style label generator (flow mode)")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "run":
+        return _run(argv[1:])
+    if argv and argv[0] == "watch":
+        return _watch(argv[1:])
+    if argv and argv[0] == "bench":
+        from .bench.harness import main as bench_main
+        return bench_main(argv[1:])
+
+    ap = argparse.ArgumentParser(description="Zebra-style label generator (flow mode)",
+                                 epilog="order PDFs: sticker_maker run <pdf-or-dir>... | watch <dir> | bench (see <command> -h)")
     ap.add_argument("--out", default="build", help="output folder")
     ap.add_argument("--config", default=os.path.join("templates", "label_config.yaml"))
     ap.add_argument("--ping", action="store_true", help="test the CLI")
-    args = ap.parse_args()
+    ap.add_argument("--formats", default=",".join(DEFAULT_FORMATS),
+                    help="outputs to render: docx, pdf, zpl (e.g. pdf,zpl)")
+    ap.add_argument("--render-workers", type=int, default=1, help="processes for sharded PDF rendering")
+    ap.add_argument("--parse", metavar="PDF", help="parse an order PDF and print rows as JSON")
+    ap.add_argument("--workers", type=int, default=1, help="processes for page parsing")
+    ap.add_argument("--cache-dir", default=None, help="parse cache folder")
+    ap.add_argument("--no-cache", action="store_true", help="always re-parse, skip the parse cache")
+    ap.add_argument("--render-cache", nargs="?", const="", default=None, metavar="DIR",
+                    help="reuse unchanged PDF pages from earlier runs (default folder: ~/.cache/sticker_maker/render)")
+    ap.add_argument("--print", dest="printers", action="append", metavar="HOST[:PORT]",
+                    help="send the ZPL (else PDF) output to a raw 9100 printer; repeatable")
+    ap.add_argument("--fake-printer", nargs="?", const=9100, type=int, metavar="PORT",
+                    help="run a local fake printer that records what it receives")
+    _add_profile_args(ap)
+    args = ap.parse_args(argv)
+    with _profiling(args):
+        _main(ap, args)
 
+def _main(ap, args):
     if args.ping:
         print("ok")
         return
 
-    docx_path, pdf_path = generate_dummy_flow(args.out, args.config)
-    print(docx_path)
-    print(pdf_path)
+    if args.fake_printer is not None:
+        from .spooler import serve_fake_printer
+        serve_fake_printer(port=args.fake_printer)
+        return
+
+    if args.parse:
+        from .cache import ParseCache, parse_orders_cached
+        cache = None if args.no_cache else ParseCache(args.cache_dir)
+        rows = parse_orders_cached(args.parse, cache, workers=args.workers)
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+
+    try:
+        formats = parse_formats(args.formats)
+        spec = load_spec(args.config)  # config errors stop here, before any rendering
+    except ValueError as e:
+        ap.error(str(e))
+
+    stats = {}
+    paths = generate_dummy_flow(args.out, spec, formats, args.render_workers, stats,
+                                _render_cache(args))
+    for path in paths:
+        print(path)
+    _print_shards(stats.get("pdf_shards"))
+    _print_render_cache(stats.get("pdf_cache"))
+
+    if args.printers:
+        job = next((p for p in paths if p.endswith(".zpl")), None) or \
+              next((p for p in paths if p.endswith(".pdf")), None)
+        if job is None:
+            ap.error("--print needs a zpl or pdf output (see --formats)")
+        from .spooler import spool_file
+        try:
+            report = spool_file(job, args.printers)
+        except ValueError as e:
+            ap.error(str(e))
+        _print_spool(report)
+        if report.get("errors"):
+            sys.exit(1)
+
+def _run(argv):
+    ap = argparse.ArgumentParser(prog="sticker_maker run",
+                                 description="order PDFs -> stickers, one output set per PDF")
+    ap.add_argument("inputs", nargs="+", metavar="PDF_OR_DIR", help="order PDFs or folders of them")
+    ap.add_argument("--out", default="build", help="output folder (summary.json goes here too)")
+    ap.add_argument("--config", default=os.path.join("templates", "label_config.yaml"))
+    ap.add_argument("--formats", default=",".join(DEFAULT_FORMATS),
+                    help="outputs to render: docx, pdf, zpl (e.g. pdf,zpl)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="PDFs processed in parallel (default: CPU count)")
+    ap.add_argument("--cache-dir", default=None, help="parse cache folder")
+    ap.add_argument("--no-cache", action="store_true", help="always re-parse, skip the parse cache")
+    ap.add_argument("--render-cache", nargs="?", const="", default=None, metavar="DIR",
+                    help="reuse unchanged PDF pages from earlier runs (default folder: ~/.cache/sticker_maker/render)")
+    _add_profile_args(ap)
+    args = ap.parse_args(argv)
+
+    from .pipeline import SUMMARY_NAME, expand_inputs, run_batch
+    if not expand_inputs(args.inputs):
+        ap.error("no PDF files found")
+    try:
+        with _profiling(args):
+            summary = run_batch(args.inputs, args.out, args.config, args.formats, args.jobs,
+                                args.cache_dir, args.no_cache, on_result=_print_result,
+                                render_cache_dir=args.render_cache)
+    except ValueError as e:
+        ap.error(str(e))
+
+    print(f"{summary['ok']}/{summary['files']} files, {summary['stickers']} stickers "
+          f"in {summary['seconds']:.2f}s = {summary['files_per_s']:.2f} files/s, "
+          f"{summary['stickers_per_s']:.0f} stickers/s (jobs={summary['jobs']})", file=sys.stderr)
+    print(os.path.join(args.out, SUMMARY_NAME))
+    if summary["failed"]:
+        sys.exit(1)
+
+def _watch(argv):
+    ap = argparse.ArgumentParser(prog="sticker_maker watch",
+                                 description="process order PDFs as they land in a folder")
+    ap.add_argument("dir", help="folder to watch for order PDFs")
+    ap.add_argument("--out", default=None, help="output folder (default: <dir>/stickers)")
+    ap.add_argument("--config", default=os.path.join("templates", "label_config.yaml"))
+    ap.add_argument("--formats", default=",".join(DEFAULT_FORMATS),
+                    help="outputs to render: docx, pdf, zpl (e.g. pdf,zpl)")
+    ap.add_argument("--poll", type=float, default=2.0, help="polling interval without inotify (s)")
+    ap.add_argument("--no-inotify", action="store_true", help="always poll")
+    ap.add_argument("--once", action="store_true", help="process the backlog and exit")
+    ap.add_argument("--cache-dir", default=None, help="parse cache folder")
+    ap.add_argument("--no-cache", action="store_true", help="always re-parse, skip the parse cache")
+    ap.add_argument("--render-cache", nargs="?", const="", default=None, metavar="DIR",
+                    help="reuse unchanged PDF pages from earlier runs (default folder: ~/.cache/sticker_maker/render)")
+    args = ap.parse_args(argv)
+    if not os.path.isdir(args.dir):
+        ap.error(f"not a folder: {args.dir}")
+
+    import signal
+    from .cache import ParseCache
+    from .watch import Watcher
+    try:
+        w = Watcher(args.dir, args.out or os.path.join(args.dir, "stickers"), args.config,
+                    args.formats, None if args.no_cache else ParseCache(args.cache_dir),
+                    args.poll, not args.no_inotify, on_result=_print_result,
+                    render_cache=_render_cache(args))
+    except ValueError as e:
+        ap.error(str(e))
+    signal.signal(signal.SIGTERM, lambda *_: w.stop_event.set())
+    print(f"watching {args.dir} -> {w.out_dir}", file=sys.stderr)
+    try:
+        w.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+def _render_cache(args):
+    if args.render_cache is None:
+        return None
+    from .rendercache import RenderCache
+    return RenderCache(args.render_cache)
+
+def _add_profile_args(ap):
+    ap.add_argument("--profile", metavar="OUT.json", help="write per-stage timings and counters here")
+    ap.add_argument("--profile-cpu", action="store_true", help="with --profile: add cProfile (also OUT.json.prof)")
+    ap.add_argument("--profile-memory", action="store_true", help="with --profile: add tracemalloc peak/top sites")
+
+@contextlib.contextmanager
+def _profiling(args):
+    if not args.profile:
+        yield
+        return
+    from .instrument import Recorder
+    rec = Recorder(args.profile_cpu, args.profile_memory).start()
+    try:
+        yield
+    finally:
+        rec.stop().write(args.profile)
+        print(f"profile: {args.profile}", file=sys.stderr)
+
+def _print_result(r):
+    # per-file line as each PDF finishes; outputs on stdout, status on stderr
+    if r["status"] != "ok":
+        print(f"FAILED {r['pdf']}: {r['error']}", file=sys.stderr)
+        return
+    for path in r["outputs"].values():
+        print(path)
+    hit = " (cached parse)" if r["cache_hit"] else \
+          f" ({r['pages_skipped']}/{r['pages']} pages skipped by pre-scan)" if r.get("pages_skipped") else ""
+    if "pages_rendered" in r:
+        hit += f" ({r['pages_rendered']}/{r['stickers']} PDF pages re-rendered)"
+    print(f"ok {r['pdf']}: {r['rows']} rows, {r['stickers']} stickers in {r['seconds']:.2f}s "
+          f"= {r['stickers_per_s']:.0f} stickers/s{hit}", file=sys.stderr)
+
+def _print_shards(shards):
+    # per-shard PDF timings go to stderr, output paths stay on stdout
+    if not shards or len(shards) < 2:
+        return
+    for s in shards:
+        if "shard" in s:
+            print(f"pdf shard {s['shard']}: {s['labels']} labels in {s['seconds']:.2f}s", file=sys.stderr)
+        else:
+            print(f"pdf merge: {s['merge_seconds']:.2f}s", file=sys.stderr)
+
+def _print_render_cache(c):
+    if c:
+        print(f"pdf cache: {c['hits']}/{c['segments']} segments reused, "
+              f"{c['pages_rendered']}/{c['pages']} pages re-rendered", file=sys.stderr)
+
+def _print_spool(r):
+    print(f"sent {r['labels']} labels ({r['bytes']} bytes, {r['batches']} batches) "
+          f"in {r['seconds']:.2f}s = {r['labels_per_s']:.0f} labels/s", file=sys.stderr)
+    for err in r.get("errors", []):
+        print(f"printer error: {err}", file=sys.stderr)
+    if r.get("resent_labels"):
+        print(f"resent: {r['resent_labels']} labels after a dropped connection "
+              f"(may have printed twice)", file=sys.stderr)
+    if r.get("unsent_labels"):
+        print(f"unsent: {r['unsent_labels']} labels", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field as _field
+from typing import Any, Dict, Optional, Tuple, Union
+import yaml
+from .labels import FIELDS
+
+def load_config(config: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Load and validate templates/label_config.yaml.
+    An already loaded config dict passes through (validated again, cheaply),
+    so renderers accept either a path or the dict loaded once by the caller.
+    Raises ValueError on a config the renderers could not use.
+    """
+    if isinstance(config, dict):
+        cfg, where = config, "config"
+    else:
+        with open(config, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        where = str(config)
+    validate_config(cfg, where)
+    return cfg
+
+def _positive(value: Any, what: str) -> None:
+    try:
+        ok = float(value) > 0
+    except (TypeError, ValueError):
+        ok = False
+    if not ok:
+        raise ValueError(f"{what} must be a positive number, got {value!r}")
+
+def validate_config(cfg: Any, where: str = "config") -> None:
+    if not isinstance(cfg, dict):
+        raise ValueError(f"{where}: expected a mapping at the top level")
+    for section in ("page", "label", "text"):
+        if not isinstance(cfg.get(section), dict):
+            raise ValueError(f"{where}: missing '{section}' section")
+
+    for key in ("width_mm", "height_mm"):
+        _positive(cfg["label"].get(key), f"{where}: label.{key}")
+    for side, v in (cfg["page"].get("margin_mm") or {}).items():
+        try:
+            float(v)
+        except (TypeError, ValueError):
+            raise ValueError(f"{where}: page.margin_mm.{side} must be a number, got {v!r}")
+
+    text = cfg["text"]
+    for i in range(1, 5):
+        key = f"line{i}_size_pt"
+        if key in text:
+            _positive(text[key], f"{where}: text.{key}")
+
+    lines = cfg.get("lines", [])
+    if not isinstance(lines, list) or not all(isinstance(ln, dict) for ln in lines):
+        raise ValueError(f"{where}: 'lines' must be a list of mappings")
+    for i, ln in enumerate(lines, start=1):
+        if ln.get("min_size_pt") is not None:
+            _positive(ln["min_size_pt"], f"{where}: lines[{i}].min_size_pt")
+
+# =========================
+# compiled spec
+# =========================
+DEFAULT_SIZES_PT = (14, 14, 14, 22)
+DEFAULT_MARGINS_MM = {"top": 2, "right": 2, "bottom": 2, "left": 2}
+LINE_GAP_PT = 2.0        # vertical gap between lines
+# Word pads table cells by 0.08in left and right by default; both renderers
+# fit against the same reduced width so PDF and DOCX get identical sizes
+WORD_CELL_PADDING_PT = 2 * 0.08 * 72
+_MM = 72.0 / 25.4
+
+@dataclass(frozen=True)
+class LineSpec:
+    """One of the four lines: style, plus its box in the centred block (points)."""
+    field: str
+    show: bool
+    bold: bool
+    size_pt: float
+    min_size_pt: Optional[float]  # shrink-to-fit floor (None = fixed size)
+    baseline_pt: float            # PDF baseline, from the page bottom
+    top_pt: float                 # top of the line box, from the page top
+
+@dataclass(frozen=True)
+class LabelSpec:
+    """
+    label_config.yaml compiled once: validated, with the page geometry and
+    the per-line style table worked out, so renderers only emit text.
+    Hidden lines keep their slot in the vertical layout (as they always have).
+    raw is the validated source dict, for backend-specific sections; read-only.
+    """
+    source: str
+    digest: str                   # sha256 of the canonical config (cache keys)
+    page_w_mm: float
+    page_h_mm: float
+    margins_mm: Tuple[float, float, float, float]  # top, right, bottom, left
+    page_w_pt: float
+    page_h_pt: float
+    content_x_pt: float           # left edge of the content box
+    content_w_pt: float
+    content_h_pt: float
+    fit_w_pt: float               # shrink-to-fit width (content minus Word cell padding)
+    font_name: str                # DOCX font family
+    font_files: Optional[Tuple[str, str]]  # PDF TTFs (regular, bold) from text.font_files
+    line_spacing: float
+    text_align: str
+    table_align: str
+    lines: Tuple[LineSpec, ...]
+    raw: Dict[str, Any] = _field(compare=False, repr=False)
+
+    @property
+    def shown(self) -> Tuple[LineSpec, ...]:
+        return tuple(ln for ln in self.lines if ln.show)
+
+    @property
+    def margins(self) -> Dict[str, float]:
+        return dict(zip(("top", "right", "bottom", "left"), self.margins_mm))
+
+    def fonts(self) -> Tuple[str, str]:
+        """Registered (regular, bold) PDF font names; resolved once per process."""
+        from .fonts import resolve_fonts
+        ff = self.font_files
+        return resolve_fonts({"regular": ff[0], "bold": ff[1]} if ff else None)
+
+def compile_spec(cfg: Dict[str, Any], source: str = "config") -> LabelSpec:
+    """Validate a loaded config and compile it into a LabelSpec (raises ValueError)."""
+    validate_config(cfg, source)
+    page, label, text = cfg["page"], cfg["label"], cfg["text"]
+    lines_cfg = cfg.get("lines", [])
+
+    m = {**DEFAULT_MARGINS_MM, **(page.get("margin_mm") or {})}
+    margins = tuple(float(m[k]) for k in ("top", "right", "bottom", "left"))
+    w_mm, h_mm = float(label["width_mm"]), float(label["height_mm"])
+    page_w, page_h = w_mm * _MM, h_mm * _MM
+    content_w = page_w - (margins[1] + margins[3]) * _MM
+    content_h = page_h - (margins[0] + margins[2]) * _MM
+    if content_w <= 0 or content_h <= 0:
+        raise ValueError(f"{source}: margins leave no room on a {w_mm} x {h_mm} mm label")
+
+    ff = text.get("font_files")
+    font_files = None
+    if ff:
+        if not isinstance(ff, dict):
+            raise ValueError(f"{source}: text.font_files must be a mapping with regular/bold")
+        font_files = (str(ff.get("regular") or ""), str(ff.get("bold") or ""))
+        for path in font_files:
+            if path and not os.path.isfile(path):
+                raise ValueError(f"{source}: text.font_files: no such file {path!r}")
+
+    sizes = [float(text.get(f"{f}_size_pt", d)) for f, d in zip(FIELDS, DEFAULT_SIZES_PT)]
+    # block of all four lines, centred vertically in the content box
+    bottom = margins[2] * _MM
+    start_y = bottom + (content_h - (sum(sizes) + LINE_GAP_PT * 3)) / 2.0
+    baseline = start_y + sum(sizes[1:]) + LINE_GAP_PT * 3
+    lines = []
+    for i, (name, size) in enumerate(zip(FIELDS, sizes)):
+        if i:
+            baseline -= size + LINE_GAP_PT
+        lc = lines_cfg[i] if len(lines_cfg) > i else {}
+        min_pt = lc.get("min_size_pt")
+        lines.append(LineSpec(field=name, show=bool(lc.get("show", True)),
+                              bold=bool(lc.get("bold", i in (0, 3))), size_pt=size,
+                              min_size_pt=float(min_pt) if min_pt is not None else None,
+                              baseline_pt=baseline, top_pt=page_h - baseline - size))
+
+    canonical = json.dumps(cfg, sort_keys=True, ensure_ascii=False, default=str)
+    return LabelSpec(
+        source=source, digest=hashlib.sha256(canonical.encode("utf-8")).hexdigest(),
+        page_w_mm=w_mm, page_h_mm=h_mm, margins_mm=margins,
+        page_w_pt=page_w, page_h_pt=page_h, content_x_pt=margins[3] * _MM,
+        content_w_pt=content_w, content_h_pt=content_h,
+        fit_w_pt=content_w - WORD_CELL_PADDING_PT,
+        font_name=str(text.get("font_name", "Times New Roman")), font_files=font_files,
+        line_spacing=float(text.get("line_spacing", 1.0)),
+        text_align=str(text.get("align", "center")),
+        table_align=str((cfg.get("word") or {}).get("align", "center")),
+        lines=tuple(lines), raw=cfg)
+
+_specs: Dict[Tuple[str, int, int], LabelSpec] = {}
+_specs_lock = threading.Lock()
+
+def load_spec(config: Union[str, Dict[str, Any], LabelSpec]) -> LabelSpec:
+    """
+    Path, loaded dict or LabelSpec -> LabelSpec.
+    Paths are compiled once per process and reused until the file's
+    mtime or size changes; a LabelSpec passes through untouched.
+    """
+    if isinstance(config, LabelSpec):
+        return config
+    if isinstance(config, dict):
+        return compile_spec(config)
+    path = os.path.abspath(str(config))
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    spec = _specs.get(key)
+    if spec is None:
+        spec = compile_spec(load_config(config), str(config))
+        with _specs_lock:
+            for old in [k for k in _specs if k[0] == path]:
+                del _specs[old]
+            _specs[key] = spec
+    return spec
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Times New Roman or a metric-compatible substitute, by file name (lowercase)
+REGULAR_FILES = ("times.ttf", "times new roman.ttf", "times_new_roman.ttf",
+                 "liberationserif-regular.ttf", "tinos-regular.ttf")
+BOLD_FILES = ("timesbd.ttf", "times new roman bold.ttf", "times_new_roman_bold.ttf",
+              "liberationserif-bold.ttf", "tinos-bold.ttf")
+
+# built-in PDF core fonts with Times metrics: no file needed, never fails
+BUILTIN_REGULAR = "Times-Roman"
+BUILTIN_BOLD = "Times-Bold"
+
+FONT_DIRS = (
+    r"C:\Windows\Fonts",
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    str(Path.home() / ".local" / "share" / "fonts"),
+    str(Path.home() / ".fonts"),
+    "/Library/Fonts",
+)
+
+_lock = threading.Lock()
+_registered: Dict[str, str] = {}                      # TTF path -> registered name
+_resolved: Dict[Tuple[str, str], Tuple[str, str]] = {}  # configured files -> (regular, bold)
+_index: Optional[Dict[str, str]] = None               # lowercase file name -> path
+
+def _font_index() -> Dict[str, str]:
+    # one walk over the usual font folders per process; first hit wins
+    global _index
+    if _index is None:
+        idx: Dict[str, str] = {}
+        for root in FONT_DIRS:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, _, files in os.walk(root):
+                for name in files:
+                    idx.setdefault(name.lower(), os.path.join(dirpath, name))
+        _index = idx
+    return _index
+
+def _fc_match(pattern: str, accepted: Tuple[str, ...]) -> Optional[str]:
+    # fontconfig knows about folders we don't scan; only accept Times-compatible files
+    exe = shutil.which("fc-match")
+    if not exe:
+        return None
+    try:
+        out = subprocess.run([exe, "-f", "%{file}", pattern], capture_output=True,
+                             text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out if out and os.path.basename(out).lower() in accepted else None
+
+def subset_tag(n: int) -> str:
+    """n-th six-letter font subset tag: 0 -> AAAAAA, 1 -> AAAAAB, ..."""
+    out = []
+    for _ in range(6):
+        n, r = divmod(n, 26)
+        out.append(chr(65 + r))
+    return "".join(reversed(out))
+
+def find_font_file(bold: bool = False) -> Optional[str]:
+    accepted = BOLD_FILES if bold else REGULAR_FILES
+    idx = _font_index()
+    for name in accepted:
+        if name in idx:
+            return idx[name]
+    return _fc_match("Times New Roman:bold" if bold else "Times New Roman", accepted)
+
+def _register(path: str) -> Optional[str]:
+    name = _registered.get(path)
+    if name is None:
+        name = "TTF-" + Path(path).stem
+        try:
+            pdfmetrics.registerFont(TTFont(name, path))
+        except Exception:
+            return None
+        _registered[path] = name
+    return name
+
+def resolve_fonts(font_files: Optional[Dict[str, str]] = None) -> Tuple[str, str]:
+    """
+    (regular, bold) font names for label text, resolved and registered once
+    per process. Order: font_files from label_config.yaml (text.font_files:
+    {regular, bold}) -> installed Times New Roman / Liberation Serif / Tinos
+    (Windows, Linux font folders, fontconfig) -> built-in Times-Roman/Bold.
+    """
+    ff = font_files or {}
+    key = (ff.get("regular") or "", ff.get("bold") or "")
+    hit = _resolved.get(key)
+    if hit:
+        return hit
+
+    with _lock:
+        hit = _resolved.get(key)
+        if hit:
+            return hit
+        names: List[str] = []
+        for configured, bold, builtin in ((key[0], False, BUILTIN_REGULAR),
+                                          (key[1], True, BUILTIN_BOLD)):
+            name = None
+            for path in (configured, find_font_file(bold)):
+                if path and os.path.exists(path):
+                    name = _register(path)
+                    if name:
+                        break
+            names.append(name or builtin)
+        hit = _resolved[key] = (names[0], names[1])
+        return hit
@@ -1,21 +1,115 @@
-import os, yaml
+import os
+import time
 from datetime import datetime
-from .layout import build_doc_flow
-from .pdfout import build_pdf_flow
+from typing import Any, Dict, Iterable, Optional, Tuple
+from . import instrument
+from .config import load_spec
+from .labels import LabelBatch
+
+# output formats, in render order; zpl is opt-in (--formats ...,zpl)
+FORMATS = ("docx", "pdf", "zpl")
+DEFAULT_FORMATS = ("docx", "pdf")
 
 def _today_hr():
     # format like 18.10.2025.
-    return datetime.now().strftime("%d.%m.%Y.") 
+    return datetime.now().strftime("%d.%m.%Y.")
+
+def parse_formats(spec) -> Tuple[str, ...]:
+    """
+    'pdf,docx' (or an iterable of names) -> validated, de-duplicated tuple.
+    """
+    names = spec.split(",") if isinstance(spec, str) else list(spec)
+    out = []
+    for name in names:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in FORMATS:
+            raise ValueError(f"unknown output format {name!r} (choose from {', '.join(FORMATS)})")
+        if name not in out:
+            out.append(name)
+    if not out:
+        raise ValueError("no output format selected")
+    return tuple(out)
+
+def _render(fmt, labels, spec, out_path, render_workers=1, render_cache=None):
+    # backends are imported here, so a skipped format never loads its libraries;
+    # returns (backend-specific info (PDF shard timings / cache stats) or None, seconds),
+    # timed here so renders in pool workers still reach the parent's spans
+    t0 = time.perf_counter()
+    info = None
+    if fmt == "docx":
+        from .layout import build_doc_flow
+        build_doc_flow(labels, spec, out_path)
+    elif fmt == "pdf":
+        if render_cache is not None:
+            from .rendercache import build_pdf_cached
+            info = build_pdf_cached(labels, spec, out_path, render_cache, render_workers)
+        elif render_workers > 1:
+            from .pdfout import build_pdf_sharded
+            info = build_pdf_sharded(labels, spec, out_path, render_workers)
+        else:
+            from .pdfout import build_pdf_flow
+            build_pdf_flow(labels, spec, out_path)
+    elif fmt == "zpl":
+        from .zplout import build_zpl_flow
+        build_zpl_flow(labels, spec, out_path)
+    return info, time.perf_counter() - t0
+
+def render_labels(labels, out_dir, config_path, formats: Iterable[str] = DEFAULT_FORMATS,
+                  stem: str = "stickers", render_workers: int = 1,
+                  stats: Optional[Dict[str, Any]] = None, render_cache=None) -> Dict[str, str]:
+    """
+    Render labels (dicts, Labels or a LabelBatch) to each requested format.
+    The config is compiled once (config.load_spec) before any rendering
+    starts; every backend, including pool workers, gets the same LabelSpec.
+    With several formats the backends run concurrently in a process pool,
+    so wall-clock time is the slowest renderer, not the sum.
+    render_workers > 1 shards the PDF over that many processes
+    (pdfout.build_pdf_sharded); its per-shard timings go to stats["pdf_shards"].
+    With a render_cache (rendercache.RenderCache) unchanged PDF pages are
+    reused from earlier runs and only changed ones re-rendered; its hit/miss
+    counts go to stats["pdf_cache"].
+    Returns {format: output path}.
+    """
+    formats = parse_formats(formats)
+    spec = load_spec(config_path)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {fmt: os.path.join(out_dir, f"{stem}.{fmt}") for fmt in formats}
+
+    if len(formats) == 1:
+        done = {formats[0]: _render(formats[0], labels, spec, paths[formats[0]],
+                                    render_workers, render_cache)}
+    else:
+        # every worker needs the full sequence: materialise generators, keep runs compact
+        if not isinstance(labels, (list, LabelBatch)):
+            labels = LabelBatch(labels)
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(formats)) as ex:
+            futures = {fmt: ex.submit(_render, fmt, labels, spec, paths[fmt],
+                                      render_workers, render_cache)
+                       for fmt in formats}
+            done = {fmt: fut.result() for fmt, fut in futures.items()}
+
+    infos = {}
+    for fmt, (info, seconds) in done.items():
+        instrument.add(f"render.{fmt}", seconds)
+        infos[fmt] = info
+    if stats is not None and infos.get("pdf"):
+        stats["pdf_cache" if render_cache is not None else "pdf_shards"] = infos["pdf"]
+    return paths
 
-def generate_dummy_flow(out_dir, config_path):
+def generate_dummy_flow(out_dir, config_path, formats: Iterable[str] = DEFAULT_FORMATS,
+                        render_workers: int = 1, stats: Optional[Dict[str, Any]] = None,
+                        render_cache=None):
     """
-    Produce DOCX/PDF with 4-line centered Zebra labels:
+    Produce DOCX/PDF (optionally ZPL) with 4-line centered Zebra labels:
       line1: LOCATION
       line2: today's DATE
       line3: SOBA <room>
       line4: SKU (big/bold)
+    Returns the output paths in the order of formats.
     """
-    os.makedirs(out_dir, exist_ok=True)
     d = _today_hr()
 
     labels = [
@@ -30,12 +124,6 @@ def generate_dummy_flow(out_dir, config_path):
         {"line1": "TSR",      "line2": d, "line3": "SOBA središnja dost.", "line4": "CF259A"},
     ]
 
-    out_docx = os.path.join(out_dir, "stickers.docx")
-    out_pdf  = os.path.join(out_dir, "stickers.pdf")
-
-    with open(config_path, "r", encoding="utf-8") as f:
-        _ = yaml.safe_load(f)
-
-    build_doc_flow(labels, config_path, out_docx)
-    build_pdf_flow(labels, config_path, out_pdf)
-    return out_docx, out_pdf
+    paths = render_labels(labels, out_dir, config_path, formats,
+                          render_workers=render_workers, stats=stats, render_cache=render_cache)
+    return tuple(paths.values())
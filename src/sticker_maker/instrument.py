@@ -0,0 +1,188 @@
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# the recorder hooks report to; None = instrumentation off (the default)
+_recorder: Optional["Recorder"] = None
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("rec", "name", "t0")
+
+    def __init__(self, rec: "Recorder", name: str):
+        self.rec, self.name = rec, name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.rec.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+# --- hooks (cheap no-ops while no recorder is active) ---
+
+def span(name: str):
+    """with span("parse.page_text"): ... -> time the block under that name."""
+    rec = _recorder
+    return _NULL_SPAN if rec is None else _Span(rec, name)
+
+def count(name: str, n: int = 1) -> None:
+    rec = _recorder
+    if rec is not None:
+        rec.counters[name] = rec.counters.get(name, 0) + n
+
+def add(name: str, seconds: float, calls: int = 1) -> None:
+    """Record a span timed elsewhere (e.g. inside a pool worker)."""
+    rec = _recorder
+    if rec is not None:
+        rec.add(name, seconds, calls)
+
+def merge(snapshot: Optional[Dict[str, Any]]) -> None:
+    """Fold a worker's Recorder.snapshot() into the active recorder."""
+    rec = _recorder
+    if rec is not None and snapshot:
+        for name, (calls, total, peak) in snapshot["spans"].items():
+            rec.add(name, total, calls, peak)
+        for name, n in snapshot["counters"].items():
+            rec.counters[name] = rec.counters.get(name, 0) + n
+
+def enabled() -> bool:
+    return _recorder is not None
+
+# --- recorder ---
+
+class Recorder:
+    """
+    Collects named spans ({name: [calls, seconds, max seconds]}) and counters
+    while started; optionally a cProfile of the same interval (cprofile=True)
+    and tracemalloc peak / top allocation sites (memory=True).
+    Only one recorder is active per process; spans from pool workers arrive
+    through merge(), cProfile and tracemalloc cover this process only.
+    """
+
+    def __init__(self, cprofile: bool = False, memory: bool = False):
+        self.spans: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.cprofile = cprofile
+        self.memory = memory
+        self._profiler = None
+        self._memory: Optional[Dict[str, Any]] = None
+        self._t0 = self._t1 = 0.0
+        self._prev: Optional[Recorder] = None
+
+    def add(self, name: str, seconds: float, calls: int = 1, peak: Optional[float] = None) -> None:
+        s = self.spans.get(name)
+        if s is None:
+            self.spans[name] = [calls, seconds, seconds if peak is None else peak]
+        else:
+            s[0] += calls
+            s[1] += seconds
+            s[2] = max(s[2], seconds if peak is None else peak)
+
+    def start(self) -> "Recorder":
+        global _recorder
+        self._prev, _recorder = _recorder, self
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cprofile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._t0 = time.perf_counter()
+        return self
+
+    def stop(self) -> "Recorder":
+        global _recorder
+        if self._t1:
+            return self  # already stopped
+        self._t1 = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+            tracemalloc.stop()
+            self._memory = {"peak_bytes": peak, "current_bytes": current,
+                            "top": [{"where": str(st.traceback[0]), "bytes": st.size, "blocks": st.count}
+                                    for st in top]}
+        _recorder = self._prev
+        return self
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Spans and counters only: small and picklable, for merge() in the parent."""
+        return {"spans": {k: list(v) for k, v in self.spans.items()}, "counters": dict(self.counters)}
+
+    def _hit_rates(self) -> Dict[str, Dict[str, float]]:
+        # normalize.<kind>.<class> counters -> share of each class per kind
+        groups: Dict[str, Dict[str, int]] = {}
+        for name, n in self.counters.items():
+            if name.startswith("normalize."):
+                _, kind, cls = name.split(".", 2)
+                groups.setdefault(kind, {})[cls] = n
+        return {kind: {cls: n / sum(g.values()) for cls, n in sorted(g.items())}
+                for kind, g in groups.items() if sum(g.values())}
+
+    def _cprofile_top(self, top: int) -> List[Dict[str, Any]]:
+        import pstats
+        st = pstats.Stats(self._profiler)
+        rows = []
+        for (file, line, func), (cc, nc, tt, ct, _) in st.stats.items():
+            rows.append({"function": f"{file}:{line}({func})", "calls": nc,
+                         "tottime": tt, "cumtime": ct})
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:top]
+
+    def report(self, top: int = 30) -> Dict[str, Any]:
+        """
+        {wall_seconds, spans: {name: {calls, seconds, max_seconds, share}},
+         counters, hit_rates, cprofile?: [top functions by cumtime], memory?}
+        share = span seconds / wall time (nested spans overlap, so shares
+        need not add up to 1).
+        """
+        wall = (self._t1 or time.perf_counter()) - self._t0
+        spans = {name: {"calls": int(c), "seconds": t, "max_seconds": m,
+                        "share": t / wall if wall else 0.0}
+                 for name, (c, t, m) in sorted(self.spans.items(), key=lambda kv: -kv[1][1])}
+        out: Dict[str, Any] = {"wall_seconds": wall, "spans": spans,
+                               "counters": dict(sorted(self.counters.items())),
+                               "hit_rates": self._hit_rates()}
+        if self._profiler is not None:
+            out["cprofile"] = self._cprofile_top(top)
+        if self._memory is not None:
+            out["memory"] = self._memory
+        return out
+
+    def write(self, path: str) -> None:
+        """JSON report to path; with cProfile also the raw stats to <path>.prof (pstats/snakeviz)."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        if self._profiler is not None:
+            self._profiler.dump_stats(path + ".prof")
+
+@contextmanager
+def profile(cprofile: bool = False, memory: bool = False) -> Iterator[Recorder]:
+    """
+    with profile() as rec:
+        parse_orders(pdf)
+    rec.report()  # or rec.write("profile.json")
+    """
+    rec = Recorder(cprofile, memory).start()
+    try:
+        yield rec
+    finally:
+        rec.stop()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import sys
+from typing import Dict, Iterable, Iterator, List, Tuple, Any
+
+FIELDS = ("line1", "line2", "line3", "line4")
+
+class Label:
+    """
+    One distinct sticker plus the number of identical copies to print.
+    line1..line3 (location / date / SOBA room) are interned, since a job
+    repeats the same handful of them. .get() mirrors the label-dict API,
+    so renderers read Label and dict inputs the same way.
+    """
+    __slots__ = ("line1", "line2", "line3", "line4", "copies")
+
+    def __init__(self, line1: str = "", line2: str = "", line3: str = "",
+                 line4: str = "", copies: int = 1):
+        self.line1 = sys.intern(line1)
+        self.line2 = sys.intern(line2)
+        self.line3 = sys.intern(line3)
+        self.line4 = line4
+        self.copies = int(copies)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], copies: int = 1) -> "Label":
+        return cls(d.get("line1", ""), d.get("line2", ""), d.get("line3", ""),
+                   d.get("line4", ""), copies)
+
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.line1, self.line2, self.line3, self.line4)
+
+    def get(self, field: str, default: str = "") -> str:
+        return getattr(self, field, default) if field in FIELDS else default
+
+    def as_dict(self) -> Dict[str, str]:
+        return {"line1": self.line1, "line2": self.line2,
+                "line3": self.line3, "line4": self.line4}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Label):
+            return NotImplemented
+        return self.key() == other.key() and self.copies == other.copies
+
+    def __repr__(self) -> str:
+        return f"Label({self.line1!r}, {self.line2!r}, {self.line3!r}, {self.line4!r}, copies={self.copies})"
+
+class LabelBatch:
+    """
+    Ordered labels with runs of identical consecutive stickers collapsed
+    into one Label carrying copies. Iterating yields the runs;
+    len() is the number of stickers (copies included).
+    """
+
+    def __init__(self, labels: Iterable[Any] = ()):
+        self.runs: List[Label] = []
+        self._count = 0
+        self.extend(labels)
+
+    def append(self, label: Any, copies: int = 1) -> None:
+        """
+        Add a Label (its own copies count) or a label dict (copies times).
+        """
+        if isinstance(label, Label):
+            lab = Label(label.line1, label.line2, label.line3, label.line4, label.copies)
+        else:
+            lab = Label.from_dict(label, copies)
+        if lab.copies < 1:
+            return
+        self._count += lab.copies
+        if self.runs and self.runs[-1].key() == lab.key():
+            self.runs[-1].copies += lab.copies
+        else:
+            self.runs.append(lab)
+
+    def extend(self, labels: Iterable[Any]) -> None:
+        for lab in labels:
+            self.append(lab)
+
+    def __iter__(self) -> Iterator[Label]:
+        return iter(self.runs)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def iter_dicts(self) -> Iterator[Dict[str, str]]:
+        # list-of-dicts adapter: one fresh dict per copy
+        for lab in self.runs:
+            for _ in range(lab.copies):
+                yield lab.as_dict()
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        return list(self.iter_dicts())
+
+def iter_runs(labels: Iterable[Any]) -> Iterator[Tuple[Any, int]]:
+    """
+    Renderer input adapter: (label, copies) for a LabelBatch, Labels or
+    plain label dicts (one copy each). Copies are expanded by the caller.
+    """
+    for lab in labels:
+        yield lab, (lab.copies if isinstance(lab, Label) else 1)
@@ -3,7 +3,11 @@ from docx.shared import Mm, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_TABLE_ALIGNMENT, WD_ALIGN_VERTICAL
 from docx.enum.section import WD_SECTION
-import yaml
+import re
+from copy import deepcopy
+from .config import load_spec
+from .labels import FIELDS, iter_runs
+from .textfit import fit_size
 
 def _mm(x): return Mm(float(x))
 
@@ -46,45 +50,54 @@ def _clear_table_borders(table):
         tblBorders.append(el)
     tblPr.append(tblBorders)
 
-def build_doc_flow(labels, config_path, out_docx):
+def build_doc_flow(labels, config_path, out_docx, engine="xml"):
     """
     Word: ONE STICKER PER PAGE (page size = label size).
     No borders. Times New Roman. Line sizes/weights from YAML.
-    """
-    with open(config_path, "r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
+    labels may be any iterable of label dicts (e.g. transform.iter_labels),
+    Labels or a LabelBatch (copies expanded page by page).
 
-    page   = cfg["page"]
-    label  = cfg["label"]
-    text   = cfg["text"]
-    lines  = cfg.get("lines", [])
-    word_c = cfg.get("word", {"align": "center"})
+    engine="xml" (default) builds one styled label through python-docx,
+    then deep-copies its XML per label and only swaps the text nodes;
+    engine="python-docx" builds every label through the high-level API.
+    """
+    spec = load_spec(config_path)  # path, dict or a LabelSpec compiled by the caller
 
-    page_w = float(label["width_mm"])
-    page_h = float(label["height_mm"])
-    margins = page.get("margin_mm", {"top": 2, "right": 2, "bottom": 2, "left": 2})
+    page_w, page_h = spec.page_w_mm, spec.page_h_mm
+    margins = spec.margins
 
     doc = Document()
     _set_section_size(doc.sections[0], page_w, page_h, margins)
 
-    table_alignment = _table_align(word_c.get("align", "center"))
-    para_alignment  = _para_align(text.get("align", "center"))
-    line_spacing    = text.get("line_spacing", 1.0)
+    table_alignment = _table_align(spec.table_align)
+    para_alignment  = _para_align(spec.text_align)
+    line_spacing    = spec.line_spacing
+    font_name       = spec.font_name
+
+    # shrink-to-fit uses the same fonts/metrics as the PDF renderer, so both outputs
+    # end up with the same sizes for the same label
+    metric_reg, metric_bold = spec.fonts()
+    fit_w = spec.fit_w_pt
+
+    def fitted(value, size_pt, bold, min_pt):
+        return fit_size(value, metric_bold if bold else metric_reg, size_pt, fit_w, min_pt)
 
-    def add_line(paragraph, value, size_pt, bold=False):
+    def add_line(paragraph, value, size_pt, bold=False, min_pt=None):
         run = paragraph.add_run(value)
-        run.font.name = text["font_name"]
-        run.font.size = Pt(size_pt)
+        run.font.name = font_name
+        run.font.size = Pt(fitted(value, size_pt, bold, min_pt))
         run.bold = bool(bold)
 
-    content_w_mm = page_w - float(margins["left"]) - float(margins["right"])
-    content_h_mm = page_h - float(margins["top"]) - float(margins["bottom"])
-
-    for i, lab in enumerate(labels):
-        if i > 0:
-            sec = doc.add_section(WD_SECTION.NEW_PAGE)
-            _set_section_size(sec, page_w, page_h, margins)
+    content_w_mm = page_w - margins["left"] - margins["right"]
+    content_h_mm = page_h - margins["top"] - margins["bottom"]
+    # (field, size_pt, bold, min_pt) per shown line - the slots the XML engine fills
+    shown = [(ln.field, ln.size_pt, ln.bold, ln.min_size_pt) for ln in spec.shown]
 
+    def add_label(lab):
+        """
+        One sticker table; returns the shown lines in order as
+        (field, size_pt, bold, min_pt) - the slots the XML engine fills.
+        """
         table = doc.add_table(rows=1, cols=1)
         table.style = None                      # no default grid
         _clear_table_borders(table)             # force no borders
@@ -108,28 +121,80 @@ def build_doc_flow(labels, config_path, out_docx):
         except Exception:
             pass
 
-        # line1 paragraph
-        p = cell.paragraphs[0]
-        p.paragraph_format.space_before = Pt(0)
-        p.paragraph_format.space_after  = Pt(0)
-        p.paragraph_format.line_spacing = line_spacing
-        p.alignment = para_alignment
-
-        # line1 (bold 14)
-        l1cfg = lines[0] if len(lines) > 0 else {"show": True, "bold": True}
-        if l1cfg.get("show", True):
-            add_line(p, lab.get("line1", ""), text.get("line1_size_pt", 14), l1cfg.get("bold", True))
-
-        # line2..line4
-        spec = [("line2","line2_size_pt"), ("line3","line3_size_pt"), ("line4","line4_size_pt")]
-        for pos, (fname, fsize_key) in enumerate(spec, start=2):
-            cfg_line = lines[pos - 1] if len(lines) >= pos else {"show": True, "bold": (pos == 4)}
-            if cfg_line.get("show", True):
-                p2 = cell.add_paragraph()
-                p2.paragraph_format.space_before = Pt(0)
-                p2.paragraph_format.space_after  = Pt(0)
-                p2.paragraph_format.line_spacing = line_spacing
-                p2.alignment = para_alignment
-                add_line(p2, lab.get(fname, ""), text.get(fsize_key, 12), cfg_line.get("bold", pos == 4))
-
+        # one paragraph per shown line; the cell already holds the first one
+        for i, slot in enumerate(shown):
+            p = cell.paragraphs[0] if i == 0 else cell.add_paragraph()
+            p.paragraph_format.space_before = Pt(0)
+            p.paragraph_format.space_after  = Pt(0)
+            p.paragraph_format.line_spacing = line_spacing
+            p.alignment = para_alignment
+            add_line(p, lab.get(slot[0], ""), *slot[1:])
+        return list(shown)
+
+    def expanded():
+        # copies of a Label / LabelBatch run are expanded only here, at emit time
+        for lab, copies in iter_runs(labels):
+            for _ in range(copies):
+                yield lab
+
+    if engine == "python-docx":
+        for i, lab in enumerate(expanded()):
+            if i > 0:
+                sec = doc.add_section(WD_SECTION.NEW_PAGE)
+                _set_section_size(sec, page_w, page_h, margins)
+            add_label(lab)
+        doc.save(out_docx)
+        return
+
+    # --- XML engine: build the fragment once, then clone it per label ---
+    body = doc.element.body
+    slots = add_label({f: "x" for f in FIELDS})
+    tbl_tpl = body[-2]                              # [..., tbl, sectPr]
+    sec = doc.add_section(WD_SECTION.NEW_PAGE)
+    _set_section_size(sec, page_w, page_h, margins)
+    break_tpl = body[-2]                            # <w:p> carrying the previous sectPr
+    body.remove(tbl_tpl)
+    body.remove(break_tpl)
+    body_sectPr = body[-1]
+    body.remove(body_sectPr)
+
+    fill = _slot_filler(tbl_tpl, slots, fitted)
+    out = []
+    for i, lab in enumerate(expanded()):
+        if i > 0:
+            out.append(deepcopy(break_tpl))
+        out.append(fill(lab))
+    body.extend(out)
+    body.append(body_sectPr)
     doc.save(out_docx)
+
+_CONTROL = re.compile(r"[\t\n\r]")
+
+def _slot_filler(tbl_tpl, slots, fitted):
+    """
+    Returns fill(lab) -> a deep copy of the template table with the text
+    (and, when shrink-to-fit changed it, the size) of each shown line replaced.
+    """
+    from docx.oxml.ns import qn
+    W_T, W_SZ, XML_SPACE = qn("w:t"), qn("w:sz"), "{http://www.w3.org/XML/1998/namespace}space"
+
+    def fill(lab):
+        tbl = deepcopy(tbl_tpl)
+        for t, (fname, size_pt, bold, min_pt) in zip(list(tbl.iter(W_T)), slots):
+            value = lab.get(fname, "")
+            if not value:
+                t.getparent().remove(t)  # python-docx writes no <w:t> for ""
+                continue
+            if min_pt is not None:
+                size = fitted(value, size_pt, bold, min_pt)
+                if size != size_pt:
+                    t.getprevious().find(W_SZ).set(qn("w:val"), str(int(round(size * 2))))
+            if _CONTROL.search(value):
+                # tabs/line breaks become <w:tab/>/<w:br/> between <w:t>s: let python-docx build the run
+                t.getparent().text = value
+                continue
+            t.text = value
+            if value != value.strip():
+                t.set(XML_SPACE, "preserve")
+        return tbl
+    return fill
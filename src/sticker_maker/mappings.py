@@ -1,14 +1,24 @@
 from __future__ import annotations
 import csv
 import re
+import threading
+from collections import Counter, deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional, Iterable
 from rapidfuzz import process, fuzz
+from .instrument import count, span
 
 # project root → data/mappings
 ROOT = Path(__file__).resolve().parents[2]
 DATA = ROOT / "data" / "mappings"
 
+PRODUCTS_CSV = DATA / "products.csv"
+LOCATIONS_CSV = DATA / "locations.csv"
+PACKS_CSV = DATA / "packs.csv"
+PRINTER_FAMILIES_CSV = DATA / "printer_families.csv"
+MAPPING_FILES = (PRODUCTS_CSV, LOCATIONS_CSV, PACKS_CSV, PRINTER_FAMILIES_CSV)
+
 # ---------- CSV loaders ----------
 def _load_csv(path: Path) -> List[Dict[str, str]]:
     rows: List[Dict[str, str]] = []
@@ -25,7 +35,7 @@ def _load_csv(path: Path) -> List[Dict[str, str]]:
 def load_products_map() -> Dict[str, str]:
     # alias -> canonical (both uppercased)
     out: Dict[str, str] = {}
-    for row in _load_csv(DATA / "products.csv"):
+    for row in _load_csv(PRODUCTS_CSV):
         a = row.get("alias", "").strip().upper()
         c = row.get("canonical", "").strip().upper()
         if a and c:
@@ -35,7 +45,7 @@ def load_products_map() -> Dict[str, str]:
 def load_locations_map() -> Dict[str, str]:
     # raw (uppercased) -> short label (as-is)
     out: Dict[str, str] = {}
-    for row in _load_csv(DATA / "locations.csv"):
+    for row in _load_csv(LOCATIONS_CSV):
         raw = row.get("raw", "").strip().upper()
         short = row.get("short_label", "").strip()
         if raw and short:
@@ -45,7 +55,7 @@ def load_locations_map() -> Dict[str, str]:
 def load_packs() -> Dict[Tuple[str, str], str]:
     # (family, color) -> sku (all uppercased)
     out: Dict[Tuple[str, str], str] = {}
-    for row in _load_csv(DATA / "packs.csv"):
+    for row in _load_csv(PACKS_CSV):
         fam = row.get("family", "").strip().upper()
         col = row.get("color", "").strip().upper()
         sku = row.get("sku", "").strip().upper()
@@ -58,19 +68,114 @@ def load_printer_families() -> Dict[str, str]:
     keyword (upper substring) -> family (e.g., 'M404' -> 'CF259')
     """
     out: Dict[str, str] = {}
-    for row in _load_csv(DATA / "printer_families.csv"):
+    for row in _load_csv(PRINTER_FAMILIES_CSV):
         kw = row.get("keyword", "").strip().upper()
         fam = row.get("family", "").strip().upper()
         if kw and fam:
             out[kw] = fam
     return out
 
+# ---------- lookup indexes ----------
+class _KeywordMatcher:
+    """
+    Aho–Corasick automaton over keyword -> value.
+    first(text) returns the value of the keyword that comes first in insertion
+    order among all keywords occurring in text (same answer as a linear
+    `kw in text` scan), in one pass over text.
+    """
+
+    def __init__(self, items: Dict[str, str]):
+        self._values = list(items.values())
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]   # keyword ranks ending at each node
+
+        for rank, kw in enumerate(items):
+            node = 0
+            for ch in kw:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._out[node].append(rank)
+
+        # failure links, breadth-first (depth-1 nodes fail to the root)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def first(self, text: str) -> Optional[str]:
+        best: Optional[int] = None
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for rank in out[node]:
+                if best is None or rank < best:
+                    best = rank
+        return None if best is None else self._values[best]
+
+def _fuzzy_best(queries: List[str], choices: List[str], scorer, min_score: int) -> List[Optional[int]]:
+    """
+    For each query: index of the best-scoring choice (first on ties, like
+    process.extractOne) if it reaches min_score, else None.
+    One multi-threaded cdist call when numpy is available.
+    """
+    if not queries or not choices:
+        return [None] * len(queries)
+    try:
+        scores = process.cdist(queries, choices, scorer=scorer,
+                               score_cutoff=min_score, workers=-1)
+    except ImportError:  # cdist returns a numpy matrix
+        out: List[Optional[int]] = []
+        for q in queries:
+            match = process.extractOne(q, choices, scorer=scorer, score_cutoff=min_score)
+            out.append(match[2] if match else None)
+        return out
+    best = scores.argmax(axis=1)
+    return [int(j) if scores[i, j] >= min_score else None for i, j in enumerate(best)]
+
+def _strip_spaces_dashes(s: str) -> str:
+    return s.replace(" ", "").replace("-", "")
+
+def _counted(kind: str, found: Dict[str, Tuple[Any, str]], texts: List[str]) -> List[Any]:
+    # batch results in input order; normalize.<kind>.<how> counts every
+    # occurrence, so repeated strings weigh as much as repeated calls
+    out, tally = [], Counter()
+    for text in texts:
+        if not text:
+            out.append(None)
+            continue
+        value, how = found[text.strip().upper()]
+        tally[how] += 1
+        out.append(value)
+    for how, n in tally.items():
+        count(f"normalize.{kind}.{how}", n)
+    return out
+
+# memo size for the public Normalizer lookups (orders repeat a handful of strings)
+_MEMO_SIZE = 4096
+
 # ---------- Normalizer ----------
 class Normalizer:
     """
     Provides:
       - normalize_product(text) -> canonical SKU (CF226A, CF259A, W1490A, ...)
       - normalize_location(text) -> short label (TSR, AVDUB 10, ...)
+      - normalize_products(texts) / normalize_locations(texts) -> batch forms
       - expand_pack(family) -> list of SKUs in CMYK/K order
       - family_from_printer(printer_text) -> family (e.g., 'CF400')
     """
@@ -85,6 +190,25 @@ class Normalizer:
         self._location_raws = list(self.locations.keys())
         self._canonicals = set(self.products.values())
 
+        # cleaned alias -> canonical (first alias wins, as in a linear scan)
+        self._cleaned_aliases: Dict[str, str] = {}
+        for alias, canon in self.products.items():
+            self._cleaned_aliases.setdefault(_strip_spaces_dashes(alias), canon)
+
+        # location prefixes: raw -> (file order, short), probed by length
+        self._location_prefixes = {raw: (i, short) for i, (raw, short) in enumerate(self.locations.items())}
+        self._location_prefix_lens = sorted({len(raw) for raw in self.locations})
+
+        self._printer_matcher = _KeywordMatcher(self.printer_families)
+        self._printer_keywords = list(self.printer_families.keys())
+
+        # per-instance LRU memo of the lookups; the normalize.* counters sit
+        # outside it, so they count every call (hit rates are per call)
+        self._product_one = lru_cache(maxsize=_MEMO_SIZE)(self._product_one)
+        self._location_one = lru_cache(maxsize=_MEMO_SIZE)(self._location_one)
+        self.family_from_printer = lru_cache(maxsize=_MEMO_SIZE)(self.family_from_printer)
+        self._pack_skus = lru_cache(maxsize=_MEMO_SIZE)(self._pack_skus)
+
     # ---- products ----
     def normalize_product(self, text: str, min_score: int = 90) -> Optional[str]:
         """
@@ -93,33 +217,67 @@ class Normalizer:
         """
         if not text:
             return None
+        canon, how = self._product_one(text, min_score)
+        count(f"normalize.product.{how}")
+        return canon
+
+    def _product_one(self, text: str, min_score: int) -> Tuple[Optional[str], str]:
         s = text.strip().upper()
+        canon, how = self._product_fast(s)
+        if canon:
+            return canon, how
+
+        # 4) fuzzy alias matching
+        with span("normalize.fuzzy"):
+            match = process.extractOne(s, self._product_aliases, scorer=fuzz.token_sort_ratio)
+        if match and match[1] >= min_score:
+            return self.products[match[0]], "fuzzy"
+        return None, "miss"
+
+    def normalize_products(self, texts: Iterable[str], min_score: int = 90) -> List[Optional[str]]:
+        """
+        Batch normalize_product: same result per item, but inputs are
+        de-duplicated, the exact/cleaned/SKU-token paths run first and all
+        remaining strings are fuzzy-matched in one cdist call.
+        """
+        texts = list(texts)
+        found: Dict[str, Tuple[Optional[str], str]] = {}
+        pending: List[str] = []
+        for text in texts:
+            s = (text or "").strip().upper()
+            if not text or s in found:
+                continue
+            found[s] = self._product_fast(s)
+            if found[s][0] is None:
+                pending.append(s)
+        with span("normalize.fuzzy"):
+            hits = _fuzzy_best(pending, self._product_aliases, fuzz.token_sort_ratio, min_score)
+        for s, j in zip(pending, hits):
+            found[s] = (self.products[self._product_aliases[j]], "fuzzy") if j is not None else (None, "miss")
+        return _counted("product", found, texts)
+
+    def _product_fast(self, s: str) -> Tuple[Optional[str], str]:
+        # steps 1-3 of normalize_product on the stripped, uppercased text -> (canonical, how)
 
         # 1) exact alias
         if s in self.products:
-            return self.products[s]
+            return self.products[s], "exact"
 
         # 2) cleaned exact (remove spaces/dashes)
-        cleaned = s.replace(" ", "").replace("-", "")
-        for alias, canon in self.products.items():
-            if alias.replace(" ", "").replace("-", "") == cleaned:
-                return canon
+        canon = self._cleaned_aliases.get(_strip_spaces_dashes(s))
+        if canon:
+            return canon, "cleaned"
 
         # 3) SKU extraction: scan on hyphen→space version so tokens split
         scan = s.replace("-", " ")
         tokens = re.findall(r"[A-Z]{1,3}\d{3,4}[A-Z]{0,3}", scan)
         for tok in tokens:
             if tok in self.products:
-                return self.products[tok]
+                return self.products[tok], "token"
             if tok in self._canonicals:
-                return tok
+                return tok, "token"
 
-        # 4) fuzzy alias matching
-        match = process.extractOne(s, self._product_aliases, scorer=fuzz.token_sort_ratio)
-        if match and match[1] >= min_score:
-            return self.products[match[0]]
-
-        return None
+        return None, "miss"
 
     # ---- locations ----
     def normalize_location(self, text: str, min_score: int = 88) -> Optional[str]:
@@ -128,33 +286,74 @@ class Normalizer:
         """
         if not text:
             return None
+        short, how = self._location_one(text, min_score)
+        count(f"normalize.location.{how}")
+        return short
+
+    def _location_one(self, text: str, min_score: int) -> Tuple[str, str]:
         s = text.strip().upper()
+        short, how = self._location_fast(s)
+        if short:
+            return short, how
 
-        if s in self.locations:
-            return self.locations[s]
+        with span("normalize.fuzzy"):
+            match = process.extractOne(s, self._location_raws, scorer=fuzz.token_sort_ratio)
+        if match and match[1] >= min_score:
+            return self.locations[match[0]], "fuzzy"
+        return s, "miss"  # fallback: keep uppercase so something prints
 
-        for raw, short in self.locations.items():
-            if s.startswith(raw):
-                return short
+    def normalize_locations(self, texts: Iterable[str], min_score: int = 88) -> List[Optional[str]]:
+        """
+        Batch normalize_location (see normalize_products).
+        """
+        texts = list(texts)
+        found: Dict[str, Tuple[Optional[str], str]] = {}
+        pending: List[str] = []
+        for text in texts:
+            s = (text or "").strip().upper()
+            if not text or s in found:
+                continue
+            found[s] = self._location_fast(s)
+            if found[s][0] is None:
+                pending.append(s)
+        with span("normalize.fuzzy"):
+            hits = _fuzzy_best(pending, self._location_raws, fuzz.token_sort_ratio, min_score)
+        for s, j in zip(pending, hits):
+            found[s] = (self.locations[self._location_raws[j]], "fuzzy") if j is not None else (s, "miss")
+        return _counted("location", found, texts)
 
-        match = process.extractOne(s, self._location_raws, scorer=fuzz.token_sort_ratio)
-        if match and match[1] >= min_score:
-            return self.locations[match[0]]
+    def _location_fast(self, s: str) -> Tuple[Optional[str], str]:
+        # exact -> startswith on the stripped, uppercased text -> (short, how)
+        if s in self.locations:
+            return self.locations[s], "exact"
 
-        return s  # fallback: keep uppercase so something prints
+        # startswith: earliest raw (file order) that prefixes s
+        best = None
+        for n in self._location_prefix_lens:
+            if n > len(s):
+                break
+            hit = self._location_prefixes.get(s[:n])
+            if hit and (best is None or hit[0] < best[0]):
+                best = hit
+        if best:
+            return best[1], "prefix"
+        return None, "miss"
 
     # ---- packs (komplet) ----
     def expand_pack(self, family: str) -> List[str]:
         fam = (family or "").strip().upper()
         if not fam:
             return []
+        return list(self._pack_skus(fam))
+
+    def _pack_skus(self, fam: str) -> Tuple[str, ...]:
         order = ["BLACK", "CYAN", "MAGENTA", "YELLOW"]
         out: List[str] = []
         for col in order:
             sku = self.packs.get((fam, col))
             if sku:
                 out.append(sku)
-        return out
+        return tuple(out)
 
     # ---- printer → family ----
     def family_from_printer(self, printer_text: str) -> Optional[str]:
@@ -165,14 +364,48 @@ class Normalizer:
         if not s:
             return None
 
-        for kw, fam in self.printer_families.items():
-            if kw and kw in s:
-                return fam
+        fam = self._printer_matcher.first(s)
+        if fam:
+            return fam
 
         # fuzzy partial match as a fallback
         if self.printer_families:
-            match = process.extractOne(s, list(self.printer_families.keys()), scorer=fuzz.partial_ratio)
+            match = process.extractOne(s, self._printer_keywords, scorer=fuzz.partial_ratio)
             if match and match[1] >= 85:
                 return self.printer_families[match[0]]
 
         return None
+
+# ---------- shared instance ----------
+# (stamp, Normalizer) swapped as one reference so readers never see a mix
+_shared: Optional[Tuple[tuple, Normalizer]] = None
+_shared_lock = threading.Lock()
+
+def _mappings_stamp() -> tuple:
+    # cheap change check: (mtime_ns, size) per mapping file, None if missing
+    out = []
+    for path in MAPPING_FILES:
+        try:
+            st = path.stat()
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+def get_normalizer() -> Normalizer:
+    """
+    Process-wide Normalizer, safe to share between threads.
+    Loaded once; rebuilt (and swapped in atomically) only when one of the
+    mapping CSVs changed on disk, so edits apply without a restart.
+    """
+    global _shared
+    stamp = _mappings_stamp()
+    snap = _shared
+    if snap is not None and snap[0] == stamp:
+        return snap[1]
+    with _shared_lock:
+        snap = _shared
+        if snap is None or snap[0] != stamp:
+            snap = (stamp, Normalizer())
+            _shared = snap
+        return snap[1]
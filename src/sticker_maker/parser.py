@@ -1,21 +1,31 @@
 from __future__ import annotations
 import re
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import pdfplumber
+from . import instrument
+from .instrument import span
+
+# bump whenever a change alters parse output; part of the parse-cache key
+PARSER_VERSION = "5"
 
 # =========================
 # helpers
 # =========================
+_LOKACIJA = re.compile(r"\blokacija\s*:", re.IGNORECASE)
+_LOKACIJA_VALUE = re.compile(r"lokacija\s*:\s*(.+)", re.IGNORECASE)
+
 def _norm(x: Any) -> str:
     return (str(x or "")).strip()
 
+_NO_ACCENTS = str.maketrans("šŠćĆčČžŽđĐ", "sScCcCzZdD")
+_TEXT_MEMO = 16384
+
+@lru_cache(maxsize=_TEXT_MEMO)
 def _lower_no_accents(s: str) -> str:
-    repl = (("š","s"),("Š","S"),("ć","c"),("Ć","C"),
-            ("č","c"),("Č","C"),("ž","z"),("Ž","Z"),
-            ("đ","d"),("Đ","D"))
+    # memoised: the same header words and cell texts come back on every page
     t = s or ""
-    for a,b in repl: t = t.replace(a,b)
-    return t.lower()
+    return t.lower() if t.isascii() else t.translate(_NO_ACCENTS).lower()
 
 def _contains(cell: Any, *needles: str) -> bool:
     name = _lower_no_accents(_norm(cell))
@@ -25,24 +35,21 @@ def _contains(cell: Any, *needles: str) -> bool:
             return True
     return False
 
-def _find_locations_in_text(txt: str) -> List[str]:
+def _find_location_headers(lines: List[Dict[str, Any]]) -> List[Tuple[str, float, float]]:
     """
-    Collect all 'Lokacija: ...' on a page (order preserved).
-    Handles case where value spills onto next line.
+    All 'Lokacija: ...' headers on a page, top to bottom, from its text lines
+    (page.extract_text_lines): [(location, top, bottom of the header)].
+    Handles case where value spills onto next line (the header then covers both).
     """
-    out: List[str] = []
-    if not txt:
-        return out
-    lines = [ln.rstrip() for ln in txt.splitlines()]
+    out: List[Tuple[str, float, float]] = []
     for i, ln in enumerate(lines):
-        if re.search(r"\blokacija\s*:", ln, flags=re.IGNORECASE):
-            m = re.search(r"lokacija\s*:\s*(.+)", ln, flags=re.IGNORECASE)
+        if _LOKACIJA.search(ln["text"]):
+            m = _LOKACIJA_VALUE.search(ln["text"])
             if m and m.group(1).strip():
-                out.append(m.group(1).strip())
-            else:
-                nxt = lines[i+1].strip() if i+1 < len(lines) else ""
-                if nxt:
-                    out.append(nxt)
+                out.append((m.group(1).strip(), ln["top"], ln["bottom"]))
+            elif i + 1 < len(lines) and lines[i+1]["text"].strip():
+                nxt = lines[i+1]
+                out.append((nxt["text"].strip(), ln["top"], max(ln["bottom"], nxt["bottom"])))
     return out
 
 def _find_date_in_text(txt: str) -> Optional[str]:
@@ -73,243 +80,420 @@ def _detect_header_map(header_cells: List[str]) -> Dict[int, str]:
     return colmap
 
 # ---- row-level heuristics ----
-_SKU_TOKEN = re.compile(r"[A-Z]{1,3}\d{3,4}[A-Z]{0,3}")  # CF226A, W1490A, A415AVAL, etc.
-_COLOR_WORDS = ("BLACK", "CYAN", "MAGENTA", "YELLOW", "CRNA", "PLAVA", "ŽUTA", "ZUTA", "MAGENTA")
+# SKU-ish: KOMPLET, a code like CF226A / W1490A / A415AVAL, or a colour word (on upper-cased text)
+_COLOR_WORDS = ("BLACK", "CYAN", "MAGENTA", "YELLOW", "CRNA", "PLAVA", "ŽUTA", "ZUTA")
+_SKUISH = re.compile(r"KOMPLET|[A-Z]{1,3}\d{3,4}[A-Z]{0,3}|" + "|".join(_COLOR_WORDS))
+# printer hints; allow multi-line models
+_PRINTER_HINT = re.compile(r"\b(HP|LaserJet|Color|Enterprise|Pro|MFP|M\d{3,4})\b", re.IGNORECASE)
+_ROOM_NUMBER = re.compile(r"\d{1,4}")   # pure numbers 1–4 digits
+_LETTER = re.compile(r"[A-Za-z]")
+_DIGIT = re.compile(r"\d")
+_KOMPLET_FAMILY = re.compile(r"komplet[\s\-]*([A-Za-z]{1,3}\d{3,4})", re.IGNORECASE)
+_ALLOWED_ROOM_WORDS = {"Porta", "Središnja pisarnica", "Sredisnja pisarnica"}
+_HEADER_TOKENS = frozenset(("pisač", "pisac", "printer", "model", "boja", "šifra", "sifra",
+                            "soba", "prostorija", "ured"))
+
+# cell flags, see _cell_flags
+_SKU, _PRINTER, _ROOM = 1, 2, 4
 
 def _is_skuish(text: str) -> bool:
     s = (text or "").upper()
-    if not s:
-        return False
-    if "KOMPLET" in s:
-        return True
-    if _SKU_TOKEN.search(s):
-        return True
-    for w in _COLOR_WORDS:
-        if w in s:
-            return True
-    return False
+    return bool(s) and _SKUISH.search(s) is not None
 
-def _is_printerish(text: str) -> bool:
-    s = (text or "")
-    if not s:
-        return False
-    # printer hints; allow multi-line models
-    if re.search(r"\b(HP|LaserJet|Color|Enterprise|Pro|MFP|M\d{3,4})\b", s, flags=re.IGNORECASE):
-        # but reject if it also looks skuish/komplet
-        return not _is_skuish(s)
-    return False
+@lru_cache(maxsize=_TEXT_MEMO)
+def _cell_flags(text: str) -> int:
+    """
+    Every row heuristic for one cell text at once, as _SKU | _PRINTER | _ROOM bits.
+    _PRINTER is never set together with _SKU (SKU-ish text is not a printer).
+    Memoised per distinct text for the life of the process: tables repeat
+    the same printer models and room numbers on every page.
+    """
+    if not text:
+        return 0
+    flags = 0
+    if _is_skuish(text):
+        flags |= _SKU
+    elif _PRINTER_HINT.search(text):
+        flags |= _PRINTER
+    s = text.strip()
+    if s and (_ROOM_NUMBER.fullmatch(s) or s in _ALLOWED_ROOM_WORDS or
+              # avoid alphanumeric like '4002dn' (printer model); short numeric fragments
+              (not _LETTER.search(s) and len(s) <= 6 and _DIGIT.search(s))):
+        flags |= _ROOM
+    return flags
 
-_ALLOWED_ROOM_WORDS = {"Porta", "Središnja pisarnica", "Sredisnja pisarnica"}
+def _is_printerish(text: str) -> bool:
+    return bool(_cell_flags(text or "") & _PRINTER)
 
 def _is_roomish(text: str) -> bool:
-    s = (text or "").strip()
-    if not s:
-        return False
-    if re.fullmatch(r"\d{1,4}", s):   # pure numbers 1–4 digits
-        return True
-    if s in _ALLOWED_ROOM_WORDS:
-        return True
-    # avoid alphanumeric like '4002dn' (printer model)
-    if re.search(r"[A-Za-z]", s):
-        return False
-    # short numeric fragments
-    if len(s) <= 6 and re.search(r"\d", s):
-        return True
-    return False
+    return bool(_cell_flags(text or "") & _ROOM)
 
 def _is_headerish_row(values: List[str]) -> bool:
     joined = " ".join(_lower_no_accents(v) for v in values if v).strip()
     if not joined:
         return False
-    header_tokens = ["pisač", "pisac", "printer", "model", "boja", "šifra", "sifra", "soba", "prostorija", "ured"]
-    if joined in header_tokens:
+    if joined in _HEADER_TOKENS:
         return True
     if "boja" in joined and ("sifra" in joined or "šifra" in joined) and len(joined) < 30:
         return True
     return False
 
 def _detect_komplet_family(product_text: str) -> Optional[str]:
-    m = re.search(r"komplet[\s\-]*([A-Za-z]{1,3}\d{3,4})", product_text or "", flags=re.IGNORECASE)
+    m = _KOMPLET_FAMILY.search(product_text or "")
     return m.group(1).upper() if m else None
 
 # =========================
-# main
+# per-page scan
 # =========================
-def parse_orders(pdf_path: str) -> List[Dict[str, Any]]:
+# extraction passes: "lines" first (cheap, precise), "text" only as a fallback
+_LINES_SETTINGS = dict(vertical_strategy="lines", horizontal_strategy="lines",
+                       intersection_tolerance=5, snap_tolerance=3,
+                       edge_min_length=10, join_tolerance=3,
+                       text_x_tolerance=2, text_y_tolerance=2)
+_TEXT_SETTINGS = dict(vertical_strategy="text", horizontal_strategy="text",
+                      text_x_tolerance=2, text_y_tolerance=2)
+_CELL_TEXT = dict(x_tolerance=2, y_tolerance=2)  # text_* tolerances above, as extract() kwargs
+
+def _find_tables(page, settings) -> List[Any]:
+    try:
+        return page.find_tables(table_settings=settings) or []
+    except Exception:
+        return []
+
+def _extract_recognised(tables) -> List[List[List[str]]]:
     """
-    Parse orders into rows:
-      {date, location, product, qty=1, room, printer, komplet_family?}
+    Rows of every table whose header maps to product/room/printer.
+    """
+    out = []
+    for t in tables:
+        try:
+            tbl = t.extract(**_CELL_TEXT)
+        except Exception:
+            continue
+        if not tbl or len(tbl) < 2:
+            continue
+        colmap = _detect_header_map([ _norm(c) for c in tbl[0] ])
+        if not any(v in ("product", "room", "printer") for v in colmap.values()):
+            continue
+        out.append(tbl)
+    return out
 
-    Behavior:
-      - multiple 'Lokacija:' per page (assign tables in order; sticky last location)
-      - state machine across rows: printer → product → room
-      - never accept printer text as product
-      - room must be numeric or allowed words
-      - date read from 'Datum: dd.mm.yyyy.'
+def _block_regions(page, lines, headers) -> List[Tuple[Optional[str], Tuple[float, float, float, float], bool]]:
+    """
+    Split the page into order blocks: [(location, bbox, searched)], top to bottom.
+    Each block runs from just below its 'Lokacija:' header to the next header
+    (or the page bottom); the strip above the first header belongs to the
+    location carried over from earlier pages (None).
+    A block with fewer than two text lines cannot hold a header + row table,
+    so it is not searched (searched=False); it is still kept when it has a
+    location, e.g. a header at the foot of a page whose table is on the next.
+    """
+    x0, top, x1, bottom = page.bbox
+    starts = [(None, top)] + [(loc, hb) for loc, _, hb in headers]
+    ends = [ht for _, ht, _ in headers] + [bottom]
+    out = []
+    for (loc, y0), y1 in zip(starts, ends):
+        searched = sum(1 for ln in lines if y0 <= (ln["top"] + ln["bottom"]) / 2.0 <= y1) >= 2
+        if searched or loc is not None:
+            out.append((loc, (x0, y0, x1, y1), searched))
+    return out
+
+def _table_rows(tbl: List[List[str]], page_date: Optional[str]) -> List[Dict[str, Any]]:
     """
+    Run the printer → product → room state machine over one table body.
+    Rows are emitted with an empty 'location'; it is bound later by _stitch_pages.
+    """
+    header = [ _norm(c) for c in tbl[0] ]
+    colmap = _detect_header_map(header)
+
     rows: List[Dict[str, Any]] = []
+    cur: Optional[Dict[str, Any]] = None
+
+    for r in tbl[1:]:
+        cells = [ _norm(x) for x in r ]
+        if _is_headerish_row(cells):
+            continue
+        flags = [_cell_flags(c) for c in cells]  # classified once per cell
+
+        # mapped values
+        prod_m = room_m = printer_m = ""
+        prod_f = room_f = 0
+        for i, val in enumerate(cells):
+            key = colmap.get(i)
+            if key == "product":
+                prod_m, prod_f = val, flags[i]
+            elif key == "room":
+                room_m, room_f = val, flags[i]
+            elif key == "printer":
+                printer_m = val
+
+        # fallbacks scanning all cells
+        printer_f = next((c for c, f in zip(cells, flags) if f & _PRINTER), "")
+
+        # candidates; _SKU excludes _PRINTER, so printer-looking text is never a product
+        prod_cand = prod_m if prod_f & _SKU else ""
+        room_cand = room_m if room_f & _ROOM else ""
+        printer_cand = printer_m or printer_f
+
+        # if product missing, try to find a SKU-ish cell in row
+        if not prod_cand:
+            prod_cand = next((c for c, f in zip(cells, flags) if f & _SKU), "")
+
+        # if room missing, try to find a room-ish cell in row
+        if not room_cand:
+            room_cand = next((c for c, f in zip(cells, flags) if f & _ROOM), "")
+
+        # 1) start a new block when we see a printer-only row
+        if printer_cand and not prod_cand and not room_cand:
+            # flush previous if it has product
+            if cur and cur.get("product"):
+                rows.append(cur)
+            cur = {
+                "date": page_date or "",
+                "location": "",
+                "product": "",
+                "qty": 1,
+                "room": "",
+                "printer": printer_cand,
+            }
+            continue
 
+        # ensure cur exists
+        if cur is None:
+            cur = {
+                "date": page_date or "",
+                "location": "",
+                "product": "",
+                "qty": 1,
+                "room": "",
+                "printer": "",
+            }
+
+        # 2) fill product
+        if prod_cand and not cur.get("product"):
+            cur["product"] = prod_cand
+            fam = _detect_komplet_family(prod_cand)
+            if fam:
+                cur["komplet_family"] = fam
+
+        # 3) fill room
+        if room_cand and not cur.get("room"):
+            cur["room"] = room_cand
+
+        # 4) fill printer
+        if printer_cand and not cur.get("printer"):
+            cur["printer"] = printer_cand
+
+        # 5) finalize when we have product + room
+        if cur.get("product") and cur.get("room"):
+            rows.append(cur)
+            cur = None
+
+    # flush pending
+    if cur and cur.get("product"):
+        rows.append(cur)
+
+    return rows
+
+def _scan_page(page) -> Dict[str, Any]:
+    """
+    Everything one page contributes, independent of the pages before it:
+      {blocks: [(location or None, [[row, ...], ...]), ...], strategy}
+    one entry per order block (see _block_regions), with the rows of each
+    recognised table in it; location None = carried over from earlier pages.
+
+    The page text is extracted once; 'Lokacija:' / 'Datum:' and the block
+    boxes come from it. Tables are then bound to blocks by position:
+      - "lines" pass first, over the page's ruling edges (skipped when there
+        are none); each table goes to the block its centre lies in
+      - "text" pass only on the crop of a block where the lines pass found
+        no recognised table
+    strategy sums up the page: lines / text / both, or none when no block
+    had enough text to hold a table.
+    A located block too small to search contributes (location, []).
+    """
+    with span("parse.page_text"):
+        lines = page.extract_text_lines(return_chars=False)
+        headers = _find_location_headers(lines)
+        page_date = _find_date_in_text("\n".join(ln["text"] for ln in lines))  # may be None
+        regions = _block_regions(page, lines, headers)
+
+    # ruled tables: one lines pass over the page, each table bound to the block it sits in
+    ruled: List[List[Any]] = [[] for _ in regions]
+    if any(r[2] for r in regions) and page.edges:  # no ruling lines: the lines pass cannot find anything
+        with span("parse.tables.lines"):
+            for t in _find_tables(page, _LINES_SETTINGS):
+                cy = (t.bbox[1] + t.bbox[3]) / 2.0
+                for i, (_, (_, y0, _, y1), _) in enumerate(regions):
+                    if y0 <= cy <= y1:
+                        ruled[i].append(t)
+                        break
+
+    blocks = []
+    used = set()
+    for (loc, bbox, searched), tables in zip(regions, ruled):
+        if not searched:
+            blocks.append((loc, []))  # location only: still sticky for the next page
+            continue
+        with span("parse.tables.lines"):
+            found = _extract_recognised(tables)
+        if found:
+            used.add("lines")
+        else:
+            with span("parse.tables.text"):
+                found = _extract_recognised(_find_tables(page.crop(bbox), _TEXT_SETTINGS))
+            used.add("text")
+        with span("parse.state_machine"):
+            blocks.append((loc, [_table_rows(tbl, page_date) for tbl in found]))
+
+    strategy = "none" if not used else "both" if len(used) == 2 else used.pop()
+    return {"blocks": blocks, "strategy": strategy}
+
+# ---- pre-scan ----
+# rows need a SKU-ish product cell and locations a 'Lokacija:' line, so a page
+# whose text has neither cannot change the output: pdfplumber never opens it
+_SKIPPED = {"blocks": [], "strategy": "skipped"}
+_WS = re.compile(r"\s+")
+
+def _is_candidate(text: str) -> bool:
+    """Pre-scan verdict on a page's pypdf text: could it contribute rows or a location?"""
+    if not text.strip():
+        return True  # nothing decoded (scans, odd fonts): let pdfplumber look
+    return bool(_LOKACIJA.search(text)) or _is_skuish(text) or _is_skuish(_WS.sub("", text))
+
+def _prescan_page(reader, i: int) -> bool:
+    try:
+        text = reader.pages[i].extract_text() or ""
+    except Exception:
+        return True
+    return _is_candidate(text)
+
+def _scan_pages(pdf_path: str, start: int = 0, stop: Optional[int] = None,
+                prescan: bool = True) -> Iterator[Dict[str, Any]]:
+    """_scan_page over pages [start, stop); with prescan, pages pypdf finds irrelevant are skipped."""
+    reader = None
+    if prescan:
+        from pypdf import PdfReader
+        reader = PdfReader(pdf_path)
     with pdfplumber.open(pdf_path) as pdf:
-        last_location = ""  # sticky location across tables on a page
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            locations = _find_locations_in_text(page_text)
-            page_date = _find_date_in_text(page_text)  # may be None
-            loc_idx = 0
-            if locations:
-                last_location = locations[0]
-
-            # two extraction passes (lines & text)
-            pass_settings = [
-                dict(vertical_strategy="lines", horizontal_strategy="lines",
-                     intersection_tolerance=5, snap_tolerance=3,
-                     edge_min_length=10, join_tolerance=3,
-                     text_x_tolerance=2, text_y_tolerance=2),
-                dict(vertical_strategy="text", horizontal_strategy="text",
-                     text_x_tolerance=2, text_y_tolerance=2),
-            ]
-
-            page_tables: List[List[List[str]]] = []
-            for ts in pass_settings:
-                try:
-                    tbls = page.extract_tables(table_settings=ts) or []
-                except Exception:
-                    tbls = []
-                if tbls:
-                    page_tables.extend(tbls)
-
-            for tbl in page_tables:
-                if not tbl or len(tbl) < 2:
+        for i in range(start, len(pdf.pages) if stop is None else stop):
+            if reader is not None:
+                with span("parse.prescan"):
+                    candidate = _prescan_page(reader, i)
+                if not candidate:
+                    yield _SKIPPED
                     continue
+            page = pdf.pages[i]
+            res = _scan_page(page)
+            page.close()  # drop cached chars/objects before the next page
+            yield res
+
+def _scan_page_range(pdf_path: str, start: int, stop: int, timed: bool = False,
+                     prescan: bool = True):
+    # worker entry point: each process opens the PDF itself;
+    # returns (page results, instrument snapshot or None)
+    rec = instrument.Recorder().start() if timed else None
+    try:
+        out = list(_scan_pages(pdf_path, start, stop, prescan))
+    finally:
+        if rec is not None:
+            rec.stop()
+    return out, rec.snapshot() if rec is not None else None
+
+def _stitch_pages(page_results, stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Bind locations to table rows in page order: each block's tables get
+    its own 'Lokacija:'; a block without one (top of a page) keeps the last
+    location seen, which stays sticky across pages.
+    """
+    last_location = ""
+    for res in page_results:
+        if stats is not None:
+            stats["pages"] = stats.get("pages", 0) + 1
+            key = "pages_" + res["strategy"]
+            stats[key] = stats.get(key, 0) + 1
+
+        for location, tables in res["blocks"]:
+            if location is not None:
+                last_location = location
+            for tbl_rows in tables:
+                for r in tbl_rows:
+                    r["location"] = last_location
+                    yield r
+
+def _iter_page_results(pdf_path: str, workers: int, prescan: bool = True) -> Iterator[Dict[str, Any]]:
+    if workers <= 1:
+        yield from _scan_pages(pdf_path, prescan=prescan)
+        return
 
-                header = [ _norm(c) for c in tbl[0] ]
-                colmap = _detect_header_map(header)
-                if not any(v in ("product", "room", "printer") for v in colmap.values()):
-                    continue
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+    # contiguous chunks, a few per worker so uneven pages still balance
+    chunk = max(1, -(-n_pages // (workers * 4)))
+    bounds = [(s, min(s + chunk, n_pages)) for s in range(0, n_pages, chunk)]
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    timed = instrument.enabled()
+
+    def collect(fut):
+        results, snapshot = fut.result()
+        instrument.merge(snapshot)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        # bounded window of chunks in flight, consumed in page order
+        pending: deque = deque()
+        for s, e in bounds:
+            pending.append(ex.submit(_scan_page_range, pdf_path, s, e, timed, prescan))
+            if len(pending) >= workers * 2:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
 
-                # choose/sticky location for this table
-                current_location = ""
-                if loc_idx < len(locations):
-                    current_location = locations[loc_idx]
-                    last_location = current_location
-                else:
-                    current_location = last_location
-
-                # --- state machine over table body ---
-                cur: Optional[Dict[str, Any]] = None
-                produced = 0
-
-                for r in tbl[1:]:
-                    cells = [ _norm(x) for x in r ]
-                    if _is_headerish_row(cells):
-                        continue
-
-                    # mapped values
-                    prod_m = room_m = printer_m = ""
-                    for i, val in enumerate(cells):
-                        key = colmap.get(i)
-                        if key == "product":
-                            prod_m = _norm(val)
-                        elif key == "room":
-                            room_m = _norm(val)
-                        elif key == "printer":
-                            printer_m = _norm(val)
-
-                    # fallbacks scanning all cells
-                    printer_f = ""
-                    for c in cells:
-                        if _is_printerish(c):
-                            printer_f = c
-                            break
-
-                    # candidates
-                    prod_cand = prod_m if _is_skuish(prod_m) else ""
-                    room_cand = room_m if _is_roomish(room_m) else ""
-                    printer_cand = printer_m or printer_f
-
-                    # guard: never accept printer-looking text as product
-                    if prod_m and _is_printerish(prod_m):
-                        prod_cand = ""
-
-                    # if product missing, try to find a SKU-ish cell in row
-                    if not prod_cand:
-                        for c in cells:
-                            if _is_skuish(c) and not _is_printerish(c):
-                                prod_cand = c
-                                break
-
-                    # if room missing, try to find a room-ish cell in row
-                    if not room_cand:
-                        for c in cells:
-                            if _is_roomish(c):
-                                room_cand = c
-                                break
-
-                    # 1) start a new block when we see a printer-only row
-                    if printer_cand and not prod_cand and not room_cand:
-                        # flush previous if it has product
-                        if cur and cur.get("product"):
-                            rows.append(cur)
-                            produced += 1
-                        cur = {
-                            "date": page_date or "",
-                            "location": current_location,
-                            "product": "",
-                            "qty": 1,
-                            "room": "",
-                            "printer": printer_cand,
-                        }
-                        continue
-
-                    # ensure cur exists
-                    if cur is None:
-                        cur = {
-                            "date": page_date or "",
-                            "location": current_location,
-                            "product": "",
-                            "qty": 1,
-                            "room": "",
-                            "printer": "",
-                        }
-
-                    # 2) fill product
-                    if prod_cand and not cur.get("product"):
-                        cur["product"] = prod_cand
-                        fam = _detect_komplet_family(prod_cand)
-                        if fam:
-                            cur["komplet_family"] = fam
-
-                    # 3) fill room
-                    if room_cand and not cur.get("room"):
-                        cur["room"] = room_cand
-
-                    # 4) fill printer
-                    if printer_cand and not cur.get("printer"):
-                        cur["printer"] = printer_cand
-
-                    # 5) finalize when we have product + room
-                    if cur.get("product") and cur.get("room"):
-                        rows.append(cur)
-                        produced += 1
-                        cur = None
-
-                # flush pending
-                if cur and cur.get("product"):
-                    rows.append(cur)
-                    produced += 1
-                    cur = None
-
-                if produced and loc_idx < len(locations):
-                    loc_idx += 1
-
-    # final clean: must have product; ignore literal 'Soba'
-    clean: List[Dict[str, Any]] = []
-    for r in rows:
+# =========================
+# main
+# =========================
+def iter_orders(pdf_path: str, workers: int = 1, stats: Optional[Dict[str, int]] = None,
+                prescan: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Generator counterpart of parse_orders: yields cleaned rows page by page,
+    releasing each page's pdfplumber caches as it goes.
+    """
+    for r in _stitch_pages(_iter_page_results(pdf_path, workers, prescan), stats):
+        # final clean: must have product; ignore literal 'Soba'
         prod = _norm(r.get("product"))
         if not prod:
             continue
         if _lower_no_accents(prod) == "soba":
             continue
-        clean.append(r)
+        yield r
+
+def parse_orders(pdf_path: str, workers: int = 1, stats: Optional[Dict[str, int]] = None,
+                 prescan: bool = True) -> List[Dict[str, Any]]:
+    """
+    Parse orders into rows:
+      {date, location, product, qty=1, room, printer, komplet_family?}
 
-    return clean
+    Behavior:
+      - multiple 'Lokacija:' per page (each table gets the block it sits in;
+        sticky last location for tables above the first header)
+      - state machine across rows: printer → product → room
+      - never accept printer text as product
+      - room must be numeric or allowed words
+      - date read from 'Datum: dd.mm.yyyy.'
+
+    workers > 1 scans pages in a process pool; results are stitched
+    in page order, so the output is identical to the serial path.
+
+    prescan=True reads each page's text with pypdf first (a few ms) and
+    skips pdfplumber for pages with neither 'Lokacija:' nor anything
+    SKU-ish (covers, terms, signatures); they cannot add rows or move the
+    sticky location, so the output is the same either way.
+
+    If a dict is passed as stats it receives per-run counters:
+      pages, pages_lines / pages_text / pages_both / pages_none (which
+      table pass served each page), pages_skipped (by the pre-scan).
+    """
+    with span("parse_orders"):
+        return list(iter_orders(pdf_path, workers, stats, prescan))
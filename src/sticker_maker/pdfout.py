@@ -1,102 +1,170 @@
-from reportlab.lib.units import mm
+import os, re, tempfile, time
 from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import yaml, os
-
-REG_NAME = "TimesNewRoman"
-BOLD_NAME = "TimesNewRoman-Bold"
-
-def _register_times_new_roman():
-    # Try Windows font files
-    win_reg = r"C:\Windows\Fonts\times.ttf"
-    win_bold = r"C:\Windows\Fonts\timesbd.ttf"
-    ok_reg = ok_bold = False
-    if os.path.exists(win_reg):
-        try:
-            pdfmetrics.registerFont(TTFont(REG_NAME, win_reg))
-            ok_reg = True
-        except Exception:
-            pass
-    if os.path.exists(win_bold):
-        try:
-            pdfmetrics.registerFont(TTFont(BOLD_NAME, win_bold))
-            ok_bold = True
-        except Exception:
-            pass
-    # Fallback to built-ins if needed
-    if not ok_reg:
-        pdfmetrics.registerFont(TTFont(REG_NAME, win_reg)) if os.path.exists(win_reg) else None
-    return ok_reg and ok_bold
+from .config import load_spec
+from .labels import FIELDS, Label, iter_runs
+from .textfit import fit_size, text_width
 
 def build_pdf_flow(labels, config_path, out_pdf):
-    with open(config_path, "r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
-
-    page  = cfg["page"]
-    label = cfg["label"]
-    text  = cfg["text"]
-    lines = cfg.get("lines", [])
-
-    _register_times_new_roman()
-
-    # page size equals label size
-    page_w = float(label["width_mm"]) * mm
-    page_h = float(label["height_mm"]) * mm
-
-    m = page.get("margin_mm", {"top": 2, "right": 2, "bottom": 2, "left": 2})
-    left = m["left"] * mm
-    right = m["right"] * mm
-    top = m["top"] * mm
-    bottom = m["bottom"] * mm
-
-    content_w = page_w - left - right
-    content_h = page_h - top - bottom
-
-    l1 = text.get("line1_size_pt", 14)
-    l2 = text.get("line2_size_pt", 14)
-    l3 = text.get("line3_size_pt", 14)
-    l4 = text.get("line4_size_pt", 22)
-
-    c = canvas.Canvas(out_pdf, pagesize=(page_w, page_h))
-
-    def draw_centered_line(value, y, size_pt, bold=False):
-        font = BOLD_NAME if bold else REG_NAME
-        # If Times not found, ReportLab will raise; fallback to Helvetica family
-        try:
-            c.setFont(font, size_pt)
-        except Exception:
-            c.setFont("Helvetica-Bold" if bold else "Helvetica", size_pt)
-        w = c.stringWidth(value, font if font in pdfmetrics.getRegisteredFontNames() else "Helvetica", size_pt)
-        x = left + (content_w - w) / 2.0
-        c.drawString(x, y, value)
-
-    for i, lab in enumerate(labels):
-        if i > 0:
-            c.showPage()
-            c.setPageSize((page_w, page_h))
-
+    """
+    PDF: one sticker per page (page size = label size).
+    labels may be any iterable of label dicts (e.g. transform.iter_labels),
+    Labels or a LabelBatch (copies expanded page by page).
+    config_path: YAML path, loaded dict or a compiled LabelSpec.
+    Identical labels share one form XObject, so repeats cost a few bytes each.
+    """
+    spec = load_spec(config_path)
+    font_reg, font_bold = spec.fonts()
+    page_size = (spec.page_w_pt, spec.page_h_pt)
+    left, content_w, fit_w = spec.content_x_pt, spec.content_w_pt, spec.fit_w_pt
+    # (field, font, size, shrink floor, baseline) per shown line, in drawing order
+    plan = [(ln.field, font_bold if ln.bold else font_reg, ln.size_pt, ln.min_size_pt, ln.baseline_pt)
+            for ln in spec.shown]
+
+    c = canvas.Canvas(out_pdf, pagesize=page_size)
+
+    def draw_label(lab):
         # NO border: keep the page clean like expected output
-
-        # vertical layout: center block within content area
-        gap = 2  # points between lines
-        total_h = l1 + l2 + l3 + l4 + gap*3
-        start_y = bottom + (content_h - total_h) / 2.0
-
-        y = start_y + l4 + l3 + l2 + gap*3
-        if len(lines) >= 1 and lines[0].get("show", True):
-            draw_centered_line(lab.get("line1", ""), y, l1, True)
-
-        y -= (l2 + gap)
-        if len(lines) >= 2 and lines[1].get("show", True):
-            draw_centered_line(lab.get("line2", ""), y, l2, False)
-
-        y -= (l3 + gap)
-        if len(lines) >= 3 and lines[2].get("show", True):
-            draw_centered_line(lab.get("line3", ""), y, l3, False)
-
-        y -= (l4 + gap)
-        if len(lines) >= 4 and lines[3].get("show", True):
-            draw_centered_line(lab.get("line4", ""), y, l4, True)
+        for fname, font, size_pt, min_pt, y in plan:
+            value = lab.get(fname, "")
+            size_pt = fit_size(value, font, size_pt, fit_w, min_pt)
+            c.setFont(font, size_pt)
+            x = left + (content_w - text_width(value, font, size_pt)) / 2.0
+            c.drawString(x, y, value)
+
+    # each distinct label is drawn once into a form XObject;
+    # every page (including qty copies) is then a single Do reference
+    forms = {}  # (line1..line4) -> form name
+
+    def form_for(lab):
+        key = tuple(lab.get(f, "") for f in FIELDS)
+        name = forms.get(key)
+        if name is None:
+            name = f"lbl{len(forms)}"
+            c.beginForm(name, 0, 0, *page_size)
+            draw_label(lab)
+            c.endForm()
+            forms[key] = name
+        return name
+
+    # copies of a Label / LabelBatch run are expanded only here, at emit time
+    first = True
+    for lab, copies in iter_runs(labels):
+        name = form_for(lab)
+        for _ in range(copies):
+            if not first:
+                c.showPage()
+                c.setPageSize(page_size)
+            first = False
+            c.doForm(name)
 
     c.save()
+
+def _split_shards(labels, n):
+    """
+    n contiguous chunks of Labels with (nearly) equal sticker counts;
+    a run of copies may be split across two chunks.
+    """
+    runs = [lab if isinstance(lab, Label) else Label.from_dict(lab, copies)
+            for lab, copies in iter_runs(labels)]
+    total = sum(lab.copies for lab in runs)
+    size = max(1, -(-total // n))
+    shards, cur, room = [], [], size
+    for lab in runs:
+        left = lab.copies
+        while left:
+            take = min(left, room)
+            cur.append(Label(lab.line1, lab.line2, lab.line3, lab.line4, take))
+            left -= take
+            room -= take
+            if room == 0:
+                shards.append(cur)
+                cur, room = [], size
+    if cur:
+        shards.append(cur)
+    return shards
+
+def _render_shard(labels, spec, out_pdf):
+    t0 = time.perf_counter()
+    build_pdf_flow(labels, spec, out_pdf)
+    return time.perf_counter() - t0
+
+_SUBSET = re.compile(r"/([A-Z]{6})\+(.+)")
+
+def _retag_subsets(writer) -> None:
+    """
+    Every shard names its embedded TTF subsets AAAAAA+<font>, AAAAAB+<font>...
+    on its own; after the merge each subset font object gets the next free
+    tag, in page order, so no two subsets in the file share a name.
+    """
+    from pypdf.generic import NameObject
+    from .fonts import subset_tag
+    seen = set()
+
+    def visit(res):
+        res = res.get_object() if res is not None else None
+        if not res or "/Font" not in res:
+            return
+        ref = res.raw_get("/Font")
+        if getattr(ref, "idnum", None) in seen:
+            return  # reportlab shares one /Font dict per shard
+        seen.add(getattr(ref, "idnum", None))
+        for fref in res["/Font"].get_object().values():
+            if getattr(fref, "idnum", None) in seen:
+                continue
+            seen.add(getattr(fref, "idnum", None))
+            font = fref.get_object()
+            m = _SUBSET.fullmatch(str(font.get("/BaseFont", "")))
+            if not m:
+                continue
+            name = NameObject(f"/{subset_tag(len(tags))}+{m.group(2)}")
+            tags.append(name)
+            font[NameObject("/BaseFont")] = name
+            if "/FontDescriptor" in font:
+                font["/FontDescriptor"].get_object()[NameObject("/FontName")] = name
+
+    tags = []
+    for page in writer.pages:
+        res = page.get("/Resources")
+        visit(res)
+        xobjects = res.get_object().get("/XObject") if res is not None else None
+        for xref in (xobjects.get_object().values() if xobjects else ()):
+            if getattr(xref, "idnum", None) not in seen:
+                seen.add(getattr(xref, "idnum", None))
+                visit(xref.get_object().get("/Resources"))
+
+def build_pdf_sharded(labels, config_path, out_pdf, workers=2):
+    """
+    build_pdf_flow split over `workers` processes: the labels are cut into
+    contiguous chunks, each rendered to a temporary PDF, then merged in order
+    with pypdf (page order and page size preserved). Embedded TTF subsets
+    are renamed so each keeps a distinct AAAAAA+ tag in the merged file.
+    Returns per-shard timings: [{"shard", "labels", "seconds"}, ..., {"merge_seconds"}]
+    (a single {"shard", "seconds"} entry when workers <= 1).
+    """
+    spec = load_spec(config_path)
+    if workers <= 1:
+        return [{"shard": 0, "seconds": _render_shard(labels, spec, out_pdf)}]
+
+    from concurrent.futures import ProcessPoolExecutor
+    from pypdf import PdfWriter
+
+    shards = _split_shards(labels, workers)
+    out_dir = os.path.dirname(os.path.abspath(out_pdf))
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".shards-") as tmp:
+        paths = [os.path.join(tmp, f"shard{i:03d}.pdf") for i in range(len(shards))]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(_render_shard, shard, spec, path)
+                       for shard, path in zip(shards, paths)]
+            timings = [{"shard": i, "labels": sum(lab.copies for lab in shard),
+                        "seconds": fut.result()}
+                       for i, (shard, fut) in enumerate(zip(shards, futures))]
+
+        t0 = time.perf_counter()
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path, import_outline=False)
+        _retag_subsets(writer)
+        with open(out_pdf, "wb") as f:
+            writer.write(f)
+        timings.append({"merge_seconds": time.perf_counter() - t0})
+    return timings
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import json
+import os
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from . import instrument
+from .cache import ParseCache, parse_orders_cached
+from .config import load_spec
+from .generate import DEFAULT_FORMATS, parse_formats, render_labels
+from .rendercache import RenderCache
+from .transform import rows_to_batch
+
+SUMMARY_NAME = "summary.json"
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """PDF paths and folders (their *.pdf, not recursive) -> sorted, de-duplicated PDF list."""
+    out, seen = [], set()
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(str(p) for p in Path(item).iterdir()
+                           if p.is_file() and p.suffix.lower() == ".pdf")
+        else:
+            found = [item]
+        for p in found:
+            key = os.path.abspath(p)
+            if key not in seen:
+                seen.add(key)
+                out.append(p)
+    return out
+
+def _stems(pdfs: List[str]) -> List[str]:
+    # output name per PDF: <stem>_stickers, so --out may be the inbox itself;
+    # same-named PDFs from different folders get -2, -3...
+    stems, used = [], {}
+    for p in pdfs:
+        stem = Path(p).stem
+        n = used.get(stem, 0) + 1
+        used[stem] = n
+        stems.append(f"{stem}_stickers" if n == 1 else f"{stem}-{n}_stickers")
+    return stems
+
+def process_pdf(pdf_path: str, out_dir: str, config, formats: Iterable[str] = DEFAULT_FORMATS,
+                stem: Optional[str] = None, cache: Optional[ParseCache] = None,
+                concurrent_formats: bool = True, render_cache=None) -> Dict[str, Any]:
+    """
+    One order PDF through parse_orders -> labels -> renderers.
+    Returns the per-file result: rows, stickers, outputs {format: path},
+    stage timings and stickers_per_s (plus pages_rendered with a
+    render_cache). Errors propagate (see run_one).
+    """
+    stem = stem or f"{Path(pdf_path).stem}_stickers"
+    t0 = time.perf_counter()
+    stats: Dict[str, Any] = {}
+    rows = parse_orders_cached(pdf_path, cache, stats=stats)
+    t1 = time.perf_counter()
+    batch = rows_to_batch(rows)
+    t2 = time.perf_counter()
+    outputs: Dict[str, str] = {}
+    rstats: Dict[str, Any] = {}
+    if len(batch):
+        # inside a pool worker the formats render one after another (no nested pools)
+        groups = [tuple(formats)] if concurrent_formats else [(f,) for f in formats]
+        for group in groups:
+            outputs.update(render_labels(batch, out_dir, config, group, stem=stem,
+                                         stats=rstats, render_cache=render_cache))
+    t3 = time.perf_counter()
+    result = {
+        "pdf": pdf_path, "status": "ok", "rows": len(rows), "stickers": len(batch),
+        "pages": stats.get("pages"), "pages_skipped": stats.get("pages_skipped", 0),
+        "cache_hit": bool(stats.get("cache_hit")),
+        "outputs": outputs,
+        "parse_seconds": t1 - t0, "label_seconds": t2 - t1, "render_seconds": t3 - t2,
+        "seconds": t3 - t0, "stickers_per_s": len(batch) / (t3 - t0) if t3 > t0 else 0.0,
+    }
+    if "pdf_cache" in rstats:
+        result["pages_rendered"] = rstats["pdf_cache"]["pages_rendered"]
+    return result
+
+def run_one(pdf_path: str, out_dir: str, config, formats, stem: str,
+            cache_dir: Optional[str], no_cache: bool, concurrent_formats: bool,
+            timed: bool = False, render_cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    process_pdf that never raises: a failure becomes a status="error" result.
+    render_cache_dir=None renders every page; "" uses the default render cache folder.
+    timed=True (pool workers of a profiled run) records spans locally and
+    returns them under "_profile" for instrument.merge in the parent.
+    """
+    rec = instrument.Recorder().start() if timed else None
+    t0 = time.perf_counter()
+    try:
+        cache = None if no_cache else ParseCache(cache_dir)
+        rcache = None if render_cache_dir is None else RenderCache(render_cache_dir)
+        result = process_pdf(pdf_path, out_dir, config, formats, stem, cache, concurrent_formats, rcache)
+    except Exception as e:
+        result = {"pdf": pdf_path, "status": "error", "error": f"{type(e).__name__}: {e}",
+                  "traceback": traceback.format_exc(), "seconds": time.perf_counter() - t0}
+    if rec is not None:
+        result["_profile"] = rec.stop().snapshot()
+    return result
+
+def run_batch(inputs: Iterable[str], out_dir: str, config_path,
+              formats: Iterable[str] = DEFAULT_FORMATS, jobs: int = 1,
+              cache_dir: Optional[str] = None, no_cache: bool = False,
+              on_result=None, render_cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run every PDF (folders expand to their *.pdf) through the pipeline,
+    jobs files at a time in a process pool. A failing file is recorded
+    and the rest carry on. Outputs go to out_dir/<pdf stem>_stickers.<format>;
+    the combined summary (per-file results + totals) is written to
+    out_dir/summary.json and returned. on_result(result) is called as
+    each file finishes. render_cache_dir (see run_one) turns on the PDF
+    render cache.
+    """
+    formats = parse_formats(formats)
+    spec = load_spec(config_path)  # config errors stop the run before any file
+    pdfs = expand_inputs(inputs)
+    stems = _stems(pdfs)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = max(1, min(int(jobs), len(pdfs) or 1))
+    nested = jobs == 1
+
+    t0 = time.perf_counter()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(pdfs)
+    if jobs == 1:
+        for i, (pdf, stem) in enumerate(zip(pdfs, stems)):
+            results[i] = run_one(pdf, out_dir, spec, formats, stem, cache_dir, no_cache, nested,
+                                 render_cache_dir=render_cache_dir)
+            if on_result:
+                on_result(results[i])
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            timed = instrument.enabled()
+            futures = {ex.submit(run_one, pdf, out_dir, spec, formats, stem,
+                                 cache_dir, no_cache, nested, timed, render_cache_dir): i
+                       for i, (pdf, stem) in enumerate(zip(pdfs, stems))}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    results[i] = fut.result()
+                    instrument.merge(results[i].pop("_profile", None))
+                except Exception as e:  # worker died (e.g. killed, BrokenProcessPool)
+                    results[i] = {"pdf": pdfs[i], "status": "error",
+                                  "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                if on_result:
+                    on_result(results[i])
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["status"] == "ok"]
+    stickers = sum(r["stickers"] for r in ok)
+    summary = {
+        "files": len(results), "ok": len(ok), "failed": len(results) - len(ok),
+        "rows": sum(r["rows"] for r in ok), "stickers": stickers,
+        "jobs": jobs, "formats": list(formats), "seconds": wall,
+        "files_per_s": len(results) / wall if wall else 0.0,
+        "stickers_per_s": stickers / wall if wall else 0.0,
+        "results": results,
+    }
+    with open(os.path.join(out_dir, SUMMARY_NAME), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
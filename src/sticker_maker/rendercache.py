@@ -0,0 +1,352 @@
+from __future__ import annotations
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .config import load_spec
+from .instrument import count, span
+from .labels import Label, iter_runs
+
+# bump when build_pdf_flow's drawing changes, so old pages are not reused
+RENDER_VERSION = "1"
+
+# default location: $STICKER_RENDER_CACHE_DIR or ~/.cache/sticker_maker/render
+DEFAULT_RENDER_CACHE_DIR = Path(os.environ.get("STICKER_RENDER_CACHE_DIR")
+                                or Path.home() / ".cache" / "sticker_maker" / "render")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# segment boundaries are content-defined: a segment ends after a label whose
+# hash is 0 mod SEGMENT_AVG (or after SEGMENT_MAX labels), so an edit or an
+# insertion only changes the segment it lands in, not every one after it
+SEGMENT_AVG = 32
+SEGMENT_MAX = 256
+
+class RenderCache:
+    """
+    Rendered PDF segments on disk, one small reportlab PDF per run of labels:
+      <cache_dir>/<sha256 of render context + labels>-r<RENDER_VERSION>.pdf
+
+    LRU by file mtime (bumped on every hit); build_pdf_cached trims the
+    directory back under max_bytes once per job.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.dir = Path(cache_dir) if cache_dir else DEFAULT_RENDER_CACHE_DIR
+        self.max_bytes = int(max_bytes)
+
+    def _path(self, digest: str) -> Path:
+        return self.dir / f"{digest}-r{RENDER_VERSION}.pdf"
+
+    def get(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, digest: str, data: bytes) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # atomic write: concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(digest))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for p in self.dir.glob("*.pdf"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()  # oldest first
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+# --- keys ---
+
+def _font_key(name: str) -> str:
+    # built-in core fonts are identified by name, TTFs by their file as well
+    from reportlab.pdfbase import pdfmetrics
+    path = getattr(getattr(pdfmetrics.getFont(name), "face", None), "filename", None)
+    if not path:
+        return name
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{name}:{path}"
+    return f"{name}:{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+def render_context(spec) -> str:
+    """Digest of everything besides the label text that decides a page: config, fonts, renderer."""
+    from reportlab import Version
+    parts = [RENDER_VERSION, Version, spec.digest] + [_font_key(f) for f in spec.fonts()]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def _segments(runs: List[Label]) -> List[List[Label]]:
+    out, cur = [], []
+    for lab in runs:
+        cur.append(lab)
+        h = hashlib.blake2b("\x1f".join(lab.key()).encode("utf-8"), digest_size=4).digest()
+        if int.from_bytes(h, "little") % SEGMENT_AVG == 0 or len(cur) >= SEGMENT_MAX:
+            out.append(cur)
+            cur = []
+    if cur:
+        out.append(cur)
+    return out
+
+def _segment_key(context: str, runs: List[Label]) -> str:
+    h = hashlib.sha256(context.encode("ascii"))
+    for lab in runs:
+        h.update("\x1f".join(lab.key()).encode("utf-8"))
+        h.update(b"\x1e%d\x1d" % lab.copies)
+    return h.hexdigest()
+
+# --- segments ---
+
+def _render_segment(runs: List[Label], spec) -> bytes:
+    from .pdfout import build_pdf_flow
+    buf = io.BytesIO()
+    build_pdf_flow(runs, spec, buf)
+    return buf.getvalue()
+
+_REF = re.compile(rb"\b(\d+) 0 R\b")
+_OBJ = re.compile(rb"(\d+) 0 obj")
+_SUBSET = re.compile(rb"/[A-Z]{6}\+([^\s/\[\]<>()]+)")
+
+def _trailer_ref(data: bytes, key: bytes, start: int) -> int:
+    m = re.compile(rb"/" + key + rb" (\d+) 0 R").search(data, start)
+    if m is None:
+        raise ValueError(f"segment: no /{key.decode()} in trailer")
+    return int(m.group(1))
+
+def _read_segment(data: bytes) -> Tuple[List[Tuple[int, bytes]], List[int], int]:
+    """
+    A reportlab PDF (classic xref table, uncompressed objects) ->
+    ([(object number, body between 'obj' and 'endobj')], page numbers in
+    order, number of the Pages root). Catalog, Info and the Pages root
+    itself are dropped; raises ValueError on anything else, damaged
+    (e.g. truncated) files included.
+    """
+    try:
+        return _parse_segment(data)
+    except (IndexError, KeyError) as e:
+        raise ValueError(f"segment: damaged ({e!r})") from None
+
+def _parse_segment(data: bytes) -> Tuple[List[Tuple[int, bytes]], List[int], int]:
+    sx = data.rfind(b"startxref")
+    if sx < 0:
+        raise ValueError("segment: no startxref")
+    xref = int(data[sx + 9:].split()[0])
+    lines = data[xref:sx].split(b"\n")
+    if lines[0].strip() != b"xref":
+        raise ValueError("segment: not a classic xref table")
+    first, n = (int(x) for x in lines[1].split())
+    offsets = [int(line[:10]) for line in lines[2:2 + n] if line[17:18] == b"n"]
+    if first != 0 or len(offsets) != n - 1:
+        raise ValueError("segment: unexpected xref layout")
+    tpos = data.find(b"trailer", xref)
+    root = _trailer_ref(data, b"Root", tpos)
+    info = _trailer_ref(data, b"Info", tpos)
+
+    bodies: Dict[int, bytes] = {}
+    ends = offsets[1:] + [xref]
+    for start, end in zip(offsets, ends):
+        m = _OBJ.match(data, start)
+        stop = data.rfind(b"endobj", start, end)
+        if m is None or stop < 0:
+            raise ValueError("segment: bad object offset")
+        bodies[int(m.group(1))] = data[m.end():stop]
+    pages = _trailer_ref(bodies[root], b"Pages", 0)
+    kids = re.search(rb"/Kids \[([^\]]*)\]", bodies[pages])
+    if kids is None:
+        raise ValueError("segment: nested page tree")
+    order = [int(k) for k in _REF.findall(kids.group(1))]
+    drop = {root, info, pages}
+    return [(num, body) for num, body in bodies.items() if num not in drop], order, pages
+
+class _Assembler:
+    """
+    Concatenates segment PDFs into one document by renumbering their objects;
+    stream data is copied through untouched, only the dictionaries are rewritten.
+    Object 1 is the catalog, 2 the single flat Pages root (like reportlab's own).
+    Every segment embeds its own TTF subsets, all tagged from AAAAAA up, so
+    their tags are renumbered to stay unique across the document, and a font
+    program identical to one already written (the usual case for labels
+    sharing their characters) is referenced instead of embedded again.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = [0, 0, 0]   # [free entry, catalog, pages root]
+        self.kids: List[int] = []
+        self.subsets = 0
+        self.programs: Dict[bytes, int] = {}  # sha1 of an embedded font program -> its object
+        self.pos = self._write(b"%PDF-1.3\n%\xe2\xe3\xcf\xd3\n", 0)
+
+    def _write(self, chunk: bytes, pos: int) -> int:
+        self.f.write(chunk)
+        return pos + len(chunk)
+
+    def _emit(self, num: int, body: bytes) -> None:
+        self.offsets[num] = self.pos
+        self.pos = self._write(b"%d 0 obj" % num + body + b"endobj\n", self.pos)
+
+    def add(self, segment) -> None:
+        from .fonts import subset_tag
+        objects, order, pages = segment
+        remap = {pages: 2}
+        fresh = []
+        for num, body in objects:
+            cut = body.find(b"stream\n")
+            program = None
+            if cut >= 0 and b"/Length1" in body[:cut] and not _REF.search(body, 0, cut):
+                program = hashlib.sha1(body).digest()
+                if program in self.programs:
+                    remap[num] = self.programs[program]
+                    continue
+            remap[num] = len(self.offsets)
+            self.offsets.append(0)
+            if program is not None:
+                self.programs[program] = remap[num]
+            fresh.append((num, body))
+
+        def ref(m):
+            num = remap.get(int(m.group(1)))
+            if num is None:
+                raise ValueError("segment: reference to an object outside the segment")
+            return b"%d 0 R" % num
+
+        tags: Dict[bytes, bytes] = {}  # old subset name -> renamed, shared by font dict and descriptor
+
+        def retag(m):
+            name = tags.get(m.group(0))
+            if name is None:
+                name = tags[m.group(0)] = b"/%s+%s" % (subset_tag(self.subsets).encode("ascii"), m.group(1))
+                self.subsets += 1
+            return name
+
+        for num, body in fresh:
+            cut = body.find(b"stream\n")
+            head, tail = (body, b"") if cut < 0 else (body[:cut], body[cut:])
+            self._emit(remap[num], _SUBSET.sub(retag, _REF.sub(ref, head)) + tail)
+        self.kids.extend(remap[num] for num in order)
+
+    def close(self, doc_id: bytes) -> None:
+        kids = b" ".join(b"%d 0 R" % k for k in self.kids)
+        self._emit(2, b"\n<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>\n" % (len(self.kids), kids))
+        self._emit(1, b"\n<<\n/PageMode /UseNone /Pages 2 0 R /Type /Catalog\n>>\n")
+        xref = self.pos
+        n = len(self.offsets)
+        table = [b"xref\n0 %d\n0000000000 65535 f \n" % n]
+        table += [b"%010d 00000 n \n" % off for off in self.offsets[1:]]
+        hexid = doc_id.hex().encode("ascii")
+        table.append(b"trailer\n<<\n/ID [<%s><%s>]\n/Root 1 0 R\n/Size %d\n>>\nstartxref\n%d\n%%%%EOF\n"
+                     % (hexid, hexid, n, xref))
+        self._write(b"".join(table), self.pos)
+
+# --- entry point ---
+
+def build_pdf_cached(labels, config_path, out_pdf, cache: RenderCache,
+                     workers: int = 1) -> Dict[str, Any]:
+    """
+    build_pdf_flow with a page cache: the labels are cut into content-defined
+    segments, each keyed by sha256(render context, its labels and copies).
+    Segments found in the cache are reused as they are, the rest are rendered
+    (over `workers` processes when > 1) and stored; the output is spliced
+    together from the segment PDFs. A one-label edit re-renders the one
+    segment holding it (SEGMENT_AVG labels on average).
+    Should the splicer not understand a segment (ValueError), the whole job
+    falls back to a plain build_pdf_flow.
+    Returns {"segments", "hits", "misses", "pages", "pages_rendered"} (plus fallback=True).
+    """
+    spec = load_spec(config_path)
+    runs = [lab if isinstance(lab, Label) else Label.from_dict(lab, copies)
+            for lab, copies in iter_runs(labels)]
+    if not runs:
+        from .pdfout import build_pdf_flow
+        build_pdf_flow(runs, spec, out_pdf)
+        return {"segments": 0, "hits": 0, "misses": 0, "pages": 0, "pages_rendered": 0}
+
+    context = render_context(spec)
+    segments = _segments(runs)
+    keys = [_segment_key(context, seg) for seg in segments]
+
+    with span("render.pdf_cache.lookup"):
+        found: Dict[str, Any] = {}
+        for key in keys:
+            if key in found:
+                continue
+            data = cache.get(key)
+            try:
+                found[key] = _read_segment(data) if data is not None else None
+            except ValueError:
+                found[key] = None  # unreadable entry: render it again
+    missing = {key: seg for key, seg in zip(keys, segments) if found[key] is None}
+    misses = sum(1 for key in keys if key in missing)
+    count("render.pdf_cache.hit", len(keys) - misses)
+    count("render.pdf_cache.miss", misses)
+
+    with span("render.pdf_cache.render"):
+        if workers > 1 and len(missing) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                rendered = list(ex.map(_render_segment, missing.values(),
+                                       [spec] * len(missing)))
+        else:
+            rendered = [_render_segment(seg, spec) for seg in missing.values()]
+        try:
+            for key, data in zip(missing, rendered):
+                found[key] = _read_segment(data)  # only segments the splicer can read are stored
+                cache.put(key, data)
+        except ValueError:
+            return _uncached(runs, spec, out_pdf, len(keys))
+        if missing:
+            cache.evict()
+
+    try:
+        with span("render.pdf_cache.assemble"), open(out_pdf, "wb") as f:
+            asm = _Assembler(f)
+            for key in keys:
+                asm.add(found[key])
+            asm.close(hashlib.md5("".join(keys).encode("ascii")).digest())
+    except ValueError:
+        return _uncached(runs, spec, out_pdf, len(keys))
+
+    sizes = [sum(lab.copies for lab in seg) for seg in segments]
+    return {"segments": len(keys), "hits": len(keys) - misses, "misses": misses, "pages": sum(sizes),
+            "pages_rendered": sum(size for key, size in zip(keys, sizes) if key in missing)}
+
+def _uncached(runs, spec, out_pdf, segments: int) -> Dict[str, Any]:
+    # reportlab wrote something the splicer does not understand (new version,
+    # unusual config): render the whole job the plain way instead of failing
+    from .pdfout import build_pdf_flow
+    count("render.pdf_cache.fallback")
+    build_pdf_flow(runs, spec, out_pdf)
+    pages = sum(lab.copies for lab in runs)
+    return {"segments": segments, "hits": 0, "misses": segments, "pages": pages,
+            "pages_rendered": pages, "fallback": True}
@@ -0,0 +1,408 @@
+from __future__ import annotations
+import queue
+import re
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+RAW_PORT = 9100
+DEFAULT_BATCH_BYTES = 64 * 1024
+DEFAULT_CONFIRM_BYTES = 64 * 1024
+DEFAULT_QUEUE_JOBS = 256
+
+_ZPL_BLOCK = re.compile(rb"\^XA.*?\^XZ\s*", re.S)
+_ZPL_PQ = re.compile(rb"\^PQ(\d+)")
+
+def parse_printer(spec: str) -> Tuple[str, int]:
+    """'host' or 'host:port' -> (host, port); port defaults to 9100."""
+    host, sep, port = spec.strip().rpartition(":")
+    if not sep:
+        return spec.strip(), RAW_PORT
+    if not host or not port.isdigit():
+        raise ValueError(f"bad printer address {spec!r} (expected host or host:port)")
+    return host, int(port)
+
+def count_zpl_labels(data: bytes) -> int:
+    """Printed stickers in a ZPL stream: one per ^XA..^XZ block times its ^PQ (no ^DF blocks)."""
+    n = 0
+    for m in _ZPL_BLOCK.finditer(data):
+        block = m.group(0)
+        if b"^DF" in block:
+            continue
+        pq = _ZPL_PQ.search(block)
+        n += int(pq.group(1)) if pq else 1
+    return n
+
+def zpl_jobs(data: bytes) -> Tuple[bytes, List[Tuple[bytes, int]]]:
+    """
+    Split a zplout job into (preamble, [(recall bytes, stickers)]).
+    The preamble holds the ^DF stored format; it is sent once per connection.
+    """
+    preamble, jobs = [], []
+    for m in _ZPL_BLOCK.finditer(data):
+        block = m.group(0)
+        if b"^DF" in block:
+            preamble.append(block)
+        else:
+            pq = _ZPL_PQ.search(block)
+            jobs.append((block, int(pq.group(1)) if pq else 1))
+    return b"".join(preamble), jobs
+
+def file_jobs(path: str) -> Tuple[bytes, List[Tuple[bytes, int]]]:
+    """(preamble, jobs) for a generated .zpl or .pdf file; a PDF is one job of its page count."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        from io import BytesIO
+        return b"", [(data, len(PdfReader(BytesIO(data)).pages))]
+    return zpl_jobs(data)
+
+class Spooler:
+    """
+    Streams print jobs to raw TCP (port 9100) printers.
+
+    One worker thread per printer keeps a persistent connection open and
+    pulls from a shared bounded queue, so a faster printer takes more work
+    and submit() blocks once max_queue jobs are waiting (backpressure).
+    Queued jobs are coalesced into sends of up to batch_bytes.
+    The preamble (e.g. the ZPL ^DF stored format) goes out on every new
+    connection, before the first batch.
+
+    Raw 9100 has no acknowledgement, so a batch only counts as sent once
+    the connection it went out on is closed cleanly: once confirm_bytes
+    have gone out (and after the last batch) the spooler half-closes
+    (SHUT_WR) and reads until the printer's EOF; a reset, or a printer that
+    hung up before that, fails the connection. The next batch opens a new
+    connection. A failed connection reconnects and resends the batches of
+    its window, up to retries times with a doubling backoff. A printer out
+    of retries gives them back to the queue and stops. Either way those
+    labels may print twice; the report counts them as resent_labels.
+    """
+
+    def __init__(self, printers: Iterable[Any], preamble: bytes = b"",
+                 batch_bytes: int = DEFAULT_BATCH_BYTES, confirm_bytes: int = DEFAULT_CONFIRM_BYTES,
+                 max_queue: int = DEFAULT_QUEUE_JOBS,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 10.0):
+        self.printers = [parse_printer(p) if isinstance(p, str) else tuple(p) for p in printers]
+        if not self.printers:
+            raise ValueError("no printers configured")
+        self.preamble = preamble
+        self.batch_bytes = int(batch_bytes)
+        self.confirm_bytes = int(confirm_bytes)
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.timeout = float(timeout)
+        self._queue: "queue.Queue[Optional[Tuple[bytes, int]]]" = queue.Queue(max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._alive = len(self.printers)
+        self._stats: Dict[str, Any] = {"labels": 0, "bytes": 0, "batches": 0, "retries": 0,
+                                       "resent_labels": 0, "connections": 0, "printers": {}}
+        self._errors: List[str] = []
+        self._unsent = 0
+        self._t0 = time.perf_counter()
+        self._threads = [threading.Thread(target=self._worker, args=(addr,), daemon=True)
+                         for addr in self.printers]
+        for t in self._threads:
+            t.start()
+
+    # --- producer side ---
+    def submit(self, data: bytes, labels: int = 1) -> None:
+        """Queue one job; blocks while the queue is full."""
+        while True:
+            if not self._alive:
+                raise ConnectionError("all printers failed: " + "; ".join(self._errors))
+            try:
+                self._queue.put((data, labels), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def submit_all(self, jobs: Iterable[Tuple[bytes, int]]) -> None:
+        for data, labels in jobs:
+            self.submit(data, labels)
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Wait for every queued job to be sent, close the connections and
+        return the report: labels, bytes, batches, retries, resent_labels,
+        connections, seconds, labels_per_s and per-printer {labels, bytes}.
+        """
+        for _ in self._threads:
+            self._put_stop()
+        for t in self._threads:
+            t.join()
+        leftover = self._unsent
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover += item[1]
+        report = dict(self._stats)
+        report["seconds"] = time.perf_counter() - self._t0
+        report["labels_per_s"] = report["labels"] / report["seconds"] if report["seconds"] else 0.0
+        if leftover or self._errors:
+            report["unsent_labels"] = leftover
+            report["errors"] = list(self._errors)
+        return report
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _put_stop(self):
+        while True:
+            try:
+                self._queue.put(None, timeout=0.5)
+                return
+            except queue.Full:
+                if not self._alive:
+                    return
+
+    # --- printer side ---
+    def _connect(self, addr):
+        sock = socket.create_connection(addr, timeout=self.timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if self.preamble:
+            sock.sendall(self.preamble)
+        with self._lock:
+            self._stats["connections"] += 1
+        return sock
+
+    def _next_batch(self) -> Tuple[List[Tuple[bytes, int]], bool]:
+        # block for one job, then take whatever else is queued up to batch_bytes
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch, size = [item], len(item[0])
+        while size < self.batch_bytes:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _confirm(self, sock) -> None:
+        # the printer must not have hung up before our FIN, and must close its
+        # side without a reset; a printer that keeps the connection open past
+        # the timeout is taken as fine (nothing came back to say otherwise)
+        sock.settimeout(0)
+        try:
+            if sock.recv(1, socket.MSG_PEEK) == b"":
+                raise ConnectionResetError("printer closed the connection before the job ended")
+        except BlockingIOError:
+            pass
+        sock.settimeout(self.timeout)
+        sock.shutdown(socket.SHUT_WR)
+        try:
+            while sock.recv(4096):
+                pass
+        except socket.timeout:
+            pass
+
+    def _credit(self, name, pending) -> None:
+        with self._lock:
+            s = self._stats
+            per = s["printers"].setdefault(name, {"labels": 0, "bytes": 0})
+            for batch in pending:
+                labels = sum(n for _, n in batch)
+                size = sum(len(data) for data, _ in batch)
+                s["labels"] += labels
+                s["bytes"] += size
+                s["batches"] += 1
+                per["labels"] += labels
+                per["bytes"] += size
+
+    def _worker(self, addr):
+        name = f"{addr[0]}:{addr[1]}"
+        sock = None
+        pending: List[List[Tuple[bytes, int]]] = []  # sent on this connection, not yet confirmed
+        pending_bytes = 0
+        done = False
+        try:
+            while not done:
+                batch, done = self._next_batch()
+                if batch:
+                    pending.append(batch)
+                    pending_bytes += sum(len(data) for data, _ in batch)
+                if not pending:
+                    continue
+                for attempt in range(self.retries + 1):
+                    try:
+                        if sock is None:
+                            sock = self._connect(addr)
+                            resend = pending  # a new connection carries the whole window
+                            if attempt:
+                                with self._lock:
+                                    self._stats["resent_labels"] += sum(n for b in pending for _, n in b)
+                        else:
+                            resend = [batch] if batch else []
+                        for b in resend:
+                            sock.sendall(b"".join(data for data, _ in b))
+                        if done or pending_bytes >= self.confirm_bytes:
+                            self._confirm(sock)
+                            sock.close()
+                            sock = None
+                            self._credit(name, pending)
+                            pending, pending_bytes = [], 0
+                        break
+                    except OSError as e:
+                        if sock is not None:
+                            sock.close()
+                            sock = None
+                        if attempt == self.retries:
+                            self._give_back([item for b in pending for item in b], f"{name}: {e}")
+                            return
+                        with self._lock:
+                            self._stats["retries"] += 1
+                        time.sleep(self.backoff * (2 ** attempt))
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _give_back(self, batch, error):
+        # requeue for the remaining printers (never blocks: a dead worker must not hang);
+        # the failed printer may already have printed some of them, so they count as resent
+        with self._lock:
+            self._errors.append(error)
+            self._alive -= 1
+            alive = self._alive
+        for item in batch:
+            try:
+                if not alive:
+                    raise queue.Full
+                self._queue.put_nowait(item)
+                with self._lock:
+                    self._stats["resent_labels"] += item[1]
+            except queue.Full:
+                with self._lock:
+                    self._unsent += item[1]
+
+def spool_file(path: str, printers: Iterable[Any], **opts) -> Dict[str, Any]:
+    """Send a generated .zpl/.pdf to the printers; returns the Spooler report."""
+    preamble, jobs = file_jobs(path)
+    total = sum(n for _, n in jobs)
+    spooler = Spooler(printers, preamble=preamble, **opts)
+    try:
+        spooler.submit_all(jobs)
+    except ConnectionError:
+        pass  # every printer failed; close() reports the errors
+    report = spooler.close()
+    if report["labels"] < total:
+        report["unsent_labels"] = total - report["labels"]
+    return report
+
+# --- local fake printer -------------------------------------------------------
+
+class FakePrinter:
+    """
+    A raw-9100 listener that records everything it receives, for testing and
+    benchmarking the spooler on one machine:
+
+        with FakePrinter() as fp:
+            spool_file("build/stickers.zpl", [fp.address])
+        count_zpl_labels(fp.data)
+
+    drop_after=N resets the drop_on-th connection (default: the first) once
+    N bytes arrived on it, discarding the chunk that crossed the limit
+    (exercises retry);
+    read_delay slows every read down (exercises backpressure).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 drop_after: Optional[int] = None, read_delay: float = 0.0, drop_on: int = 1):
+        self._srv = socket.create_server((host, port))
+        self.address = self._srv.getsockname()[:2]
+        self.drop_after = drop_after
+        self.drop_on = drop_on
+        self.read_delay = read_delay
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self.connections = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    @property
+    def data(self) -> bytes:
+        with self._lock:
+            return bytes(self._buf)
+
+    def _serve(self):
+        self._srv.settimeout(0.2)
+        clients = []
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._srv.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.connections += 1
+            drop = self.drop_after if self.connections == self.drop_on else None
+            t = threading.Thread(target=self._client, args=(conn, drop), daemon=True)
+            t.start()
+            clients.append(t)
+        for t in clients:
+            t.join()
+
+    def _client(self, conn, drop):
+        got = 0
+        with conn:
+            conn.settimeout(0.2)
+            while not self._stop.is_set():
+                try:
+                    chunk = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                if drop is not None and got + len(chunk) >= drop:
+                    # hang up mid-job with a reset, like a printer that power-cycles
+                    conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    return
+                got += len(chunk)
+                with self._lock:
+                    self._buf += chunk
+                if self.read_delay:
+                    time.sleep(self.read_delay)
+
+    def close(self):
+        self._stop.set()
+        self._srv.close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def serve_fake_printer(host: str = "127.0.0.1", port: int = RAW_PORT) -> None:
+    """Run a FakePrinter in the foreground, printing received bytes/labels every second."""
+    fp = FakePrinter(host, port)
+    print(f"fake printer listening on {fp.address[0]}:{fp.address[1]}", flush=True)
+    last = -1
+    try:
+        while True:
+            time.sleep(1.0)
+            data = fp.data
+            if len(data) != last:
+                last = len(data)
+                print(f"{len(data)} bytes, {count_zpl_labels(data)} labels", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fp.close()
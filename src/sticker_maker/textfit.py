@@ -0,0 +1,46 @@
+from __future__ import annotations
+import math
+from functools import lru_cache
+from typing import Dict, Optional
+from reportlab.pdfbase import pdfmetrics
+
+# per-font advance tables at 1pt, Latin + Latin Extended-A precomputed
+_ADVANCES: Dict[str, Dict[str, float]] = {}
+_PRECOMPUTED = [chr(c) for c in range(32, 0x180)]
+
+def _advances(font_name: str) -> Dict[str, float]:
+    table = _ADVANCES.get(font_name)
+    if table is None:
+        font = pdfmetrics.getFont(font_name)
+        table = {ch: font.stringWidth(ch, 1.0) for ch in _PRECOMPUTED}
+        _ADVANCES[font_name] = table
+    return table
+
+def text_width(text: str, font_name: str, size: float) -> float:
+    """
+    Same result as pdfmetrics.stringWidth, from a cached advance table.
+    """
+    table = _advances(font_name)
+    w = 0.0
+    for ch in text:
+        adv = table.get(ch)
+        if adv is None:
+            adv = table[ch] = pdfmetrics.getFont(font_name).stringWidth(ch, 1.0)
+        w += adv
+    return w * size
+
+@lru_cache(maxsize=65536)
+def fit_size(text: str, font_name: str, size: float, max_width: float,
+             min_size: Optional[float] = None) -> float:
+    """
+    Point size for text to fit max_width: size itself when it fits or when
+    min_size is None (fitting off), else shrunk in half-point steps
+    (Word's size unit), never below min_size.
+    """
+    if min_size is None or size <= min_size:
+        return size
+    w = text_width(text, font_name, size)
+    if w <= max_width:
+        return size
+    fitted = math.floor(size * max_width / w * 2) / 2.0
+    return max(float(min_size), fitted)
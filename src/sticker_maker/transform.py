@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Iterator
 from datetime import datetime
-from .mappings import Normalizer
+from itertools import islice
+from .mappings import Normalizer, get_normalizer
+from .labels import Label, LabelBatch
+from .instrument import span
 import re
 
 def today_hr() -> str:
@@ -26,13 +29,33 @@ def make_line3(room: Optional[str]) -> str:
 
 
 
-def rows_to_labels(rows: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+# rows per Normalizer batch lookup; bounded so iter_labels keeps streaming
+_BATCH_ROWS = 2048
+
+def iter_label_runs(rows: Iterable[Dict[str, Any]]) -> Iterator[Label]:
     """
-    Convert parsed rows into 4-line label dicts.
-    Uses row['date'] from the PDF when available; falls back to today.
+    Compact form of iter_labels: one Label per (row, SKU) with copies=qty
+    instead of qty separate dicts.
+    Locations/products are normalized per batch of rows in one call each.
     """
-    n = Normalizer()
-    out: List[Dict[str, str]] = []
+    n = get_normalizer()
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, _BATCH_ROWS))
+        if not batch:
+            return
+        yield from _batch_runs(batch, n)
+
+def _is_komplet(row: Dict[str, Any]) -> bool:
+    # komplet rows resolve through packs, not through the product lookup
+    return bool((row.get("komplet_family") or "").strip()) or "KOMPLET" in (row.get("product") or "").upper()
+
+def _batch_runs(rows: List[Dict[str, Any]], n: Normalizer) -> Iterator[Label]:
+    loc_texts = [(row.get("location") or "").strip() for row in rows]
+    prod_texts = [(row.get("product") or "").strip() for row in rows if not _is_komplet(row)]
+    with span("labels.normalize"):
+        loc_map = dict(zip(loc_texts, n.normalize_locations(loc_texts)))
+        prod_map = dict(zip(prod_texts, n.normalize_products(prod_texts)))
 
     for row in rows:
         loc_raw = (row.get("location") or "").strip()
@@ -43,7 +66,7 @@ def rows_to_labels(rows: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         date_str = (row.get("date") or "").strip() or today_hr()
 
         # normalize location to short label (or keep uppercase)
-        loc_short = n.normalize_location(loc_raw) or loc_raw.upper()
+        loc_short = loc_map[loc_raw] or loc_raw.upper()
 
         # Decide SKUs
         skus: List[str] = []
@@ -65,17 +88,37 @@ def rows_to_labels(rows: List[Dict[str, Any]]) -> List[Dict[str, str]]:
 
         # (c) otherwise treat as single-product and normalize to a canonical SKU
         if not skus:
-            canon = n.normalize_product(prod_raw)
+            # a komplet row whose family has no pack falls back to a single lookup
+            canon = prod_map[prod_raw] if prod_raw in prod_map else n.normalize_product(prod_raw)
             if canon:
                 skus.append(canon)
 
-        # build final labels, duplicate by qty
+        # build final labels, qty as the copies count
+        line3 = make_line3(room)
         for sku in skus or [""]:
-            for _ in range(max(1, qty)):
-                out.append({
-                    "line1": loc_short,
-                    "line2": date_str,
-                    "line3": make_line3(room),
-                    "line4": sku,
-                })
-    return out
+            yield Label(loc_short, date_str, line3, sku, max(1, qty))
+
+def iter_labels(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, str]]:
+    """
+    Generator counterpart of rows_to_labels: consumes rows lazily
+    (e.g. from parser.iter_orders) and yields one label dict per copy.
+    """
+    for lab in iter_label_runs(rows):
+        for _ in range(lab.copies):
+            yield lab.as_dict()
+
+def rows_to_labels(rows: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Convert parsed rows into 4-line label dicts.
+    Uses row['date'] from the PDF when available; falls back to today.
+    """
+    with span("labels.expand"):
+        return list(iter_labels(rows))
+
+def rows_to_batch(rows: Iterable[Dict[str, Any]]) -> LabelBatch:
+    """
+    Like rows_to_labels, but returns a LabelBatch with identical
+    consecutive stickers collapsed into copies.
+    """
+    with span("labels.expand"):
+        return LabelBatch(iter_label_runs(rows))
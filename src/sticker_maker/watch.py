@@ -0,0 +1,248 @@
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .cache import ParseCache, file_sha256
+from .config import load_spec
+from .generate import DEFAULT_FORMATS, parse_formats
+from .mappings import get_normalizer
+from .pipeline import process_pdf
+
+MANIFEST_NAME = ".sticker_manifest.json"
+DEFAULT_POLL_SECONDS = 2.0
+
+# --- manifest ---
+
+def _atomic_write_json(path: str, data: Any) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+class Manifest:
+    """
+    What the watcher has already done, kept next to the outputs:
+      done:  {sha256 of PDF bytes: {pdf, status, outputs | error, formats, config, at}}
+      files: {file name: [size, mtime_ns, sha256]}  (skips re-hashing on restart)
+    A file is (re)processed unless its content hash is in done with status ok
+    and the same formats and config digest, so a restart, a touch or a copy
+    of an already processed PDF is a no-op, while a failed file or a changed
+    --formats / label config is processed again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.done: Dict[str, Dict[str, Any]] = data.get("done", {})
+        self.files: Dict[str, List[Any]] = data.get("files", {})
+
+    def digest(self, path: str) -> Optional[str]:
+        """Content hash of path, reusing the stored one while size and mtime are unchanged."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        name = os.path.basename(path)
+        known = self.files.get(name)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        digest = file_sha256(path)
+        self.files[name] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def is_done(self, digest: str, formats: List[str], config: str) -> bool:
+        entry = self.done.get(digest)
+        return bool(entry) and entry.get("status") == "ok" and \
+            entry.get("formats") == formats and entry.get("config") == config
+
+    def record(self, digest: str, entry: Dict[str, Any]) -> None:
+        self.done[digest] = entry
+        self.save()
+
+    def save(self) -> None:
+        _atomic_write_json(self.path, {"done": self.done, "files": self.files})
+
+# --- change sources ---
+
+class _Inotify:
+    """Linux inotify through ctypes: names of files closed after writing or moved in."""
+    IN_CLOSE_WRITE, IN_MOVED_TO = 0x00000008, 0x00000080
+    IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def wait(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names, off = [], 0
+        while off + self._EVENT.size <= len(buf):
+            _, _, _, length = self._EVENT.unpack_from(buf, off)
+            off += self._EVENT.size
+            name = buf[off:off + length].rstrip(b"\0")
+            off += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class _Poller:
+    """Fallback: directory listing every interval; a file is reported once its size/mtime settle."""
+
+    def __init__(self, path: str, interval: float):
+        self.path, self.interval = path, interval
+        self._last: Dict[str, Tuple[int, int]] = {}
+        self._reported: Dict[str, Tuple[int, int]] = {}
+
+    def wait(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self.interval))
+        now = {}
+        with os.scandir(self.path) as it:
+            for e in it:
+                if e.is_file():
+                    st = e.stat()
+                    now[e.name] = (st.st_size, st.st_mtime_ns)
+        # stable = unchanged since the previous listing (not still being written)
+        out = [n for n, sig in now.items()
+               if self._last.get(n) == sig and self._reported.get(n) != sig]
+        for n in out:
+            self._reported[n] = now[n]
+        self._last = now
+        return out
+
+    def close(self) -> None:
+        pass
+
+def _change_source(path: str, poll: float, use_inotify: bool = True):
+    if use_inotify:
+        try:
+            return _Inotify(path)
+        except (OSError, AttributeError):
+            pass
+    return _Poller(path, poll)
+
+# --- watcher ---
+
+class Watcher:
+    """
+    Watches in_dir for order PDFs and runs each new or changed one
+    through parse -> labels -> render in this process, so the Normalizer,
+    font registry and compiled config stay warm between files.
+    Outputs are rendered into a temporary folder inside out_dir and moved
+    into place with os.replace, so readers never see a half-written file.
+    """
+
+    def __init__(self, in_dir: str, out_dir: str, config_path, formats=DEFAULT_FORMATS,
+                 cache: Optional[ParseCache] = None, poll: float = DEFAULT_POLL_SECONDS,
+                 use_inotify: bool = True,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 render_cache=None):
+        self.in_dir, self.out_dir = in_dir, out_dir
+        self.formats = parse_formats(formats)
+        self.spec = load_spec(config_path)
+        self.cache = cache
+        self.render_cache = render_cache
+        self.poll = poll
+        self.use_inotify = use_inotify
+        self.on_result = on_result
+        self.stop_event = threading.Event()
+        self.mode = ""
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(out_dir, MANIFEST_NAME))
+        # warm up once: mappings + fonts are then shared by every file
+        get_normalizer()
+        self.spec.fonts()
+
+    def _is_pdf(self, name: str) -> bool:
+        return name.lower().endswith(".pdf") and not name.startswith(".")
+
+    def process(self, name: str) -> Optional[Dict[str, Any]]:
+        """Run one file unless its content was already processed; returns the result or None."""
+        path = os.path.join(self.in_dir, name)
+        digest = self.manifest.digest(path)
+        if digest is None or self.manifest.is_done(digest, list(self.formats), self.spec.digest):
+            return None
+        stem = f"{Path(name).stem}_stickers"
+        tmp = tempfile.mkdtemp(prefix=".render-", dir=self.out_dir)
+        try:
+            result = process_pdf(path, tmp, self.spec, self.formats, stem, self.cache,
+                                 concurrent_formats=False, render_cache=self.render_cache)
+            outputs = {}
+            for fmt, p in result["outputs"].items():
+                final = os.path.join(self.out_dir, os.path.basename(p))
+                os.replace(p, final)
+                outputs[fmt] = final
+            result["outputs"] = outputs
+        except Exception as e:
+            result = {"pdf": path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        entry = {k: result[k] for k in ("pdf", "status", "outputs", "error", "stickers") if k in result}
+        entry["formats"], entry["config"] = list(self.formats), self.spec.digest
+        entry["at"] = datetime.now().isoformat(timespec="seconds")
+        self.manifest.record(digest, entry)
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def scan(self) -> int:
+        """Process everything in in_dir not yet in the manifest (startup / resume); returns count."""
+        n = 0
+        for name in sorted(os.listdir(self.in_dir)):
+            if self._is_pdf(name) and os.path.isfile(os.path.join(self.in_dir, name)):
+                n += self.process(name) is not None
+        return n
+
+    def run(self, once: bool = False) -> None:
+        """scan(), then handle changes until stop_event is set (once=True: scan only)."""
+        source = None if once else _change_source(self.in_dir, self.poll, self.use_inotify)
+        self.mode = "once" if source is None else \
+            "inotify" if isinstance(source, _Inotify) else "polling"
+        try:
+            self.scan()
+            while source is not None and not self.stop_event.is_set():
+                for name in source.wait(1.0):
+                    if self._is_pdf(name):
+                        self.process(name)
+        finally:
+            if source is not None:
+                source.close()
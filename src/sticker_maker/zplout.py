@@ -0,0 +1,130 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from .config import LINE_GAP_PT, load_spec
+from .labels import FIELDS, iter_runs
+
+# stored format name on the printer (R: = DRAM, cleared on power cycle)
+FORMAT_NAME = "R:STICKER.ZPL"
+DEFAULT_DPI = 203
+
+def _escape(value: str) -> str:
+    # ^FH_ field data: '_' starts a hex escape, '^' and '~' are ZPL commands
+    return value.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+def _layout(spec) -> Tuple[Dict[str, int], List[Tuple[int, Any, List[int], int, int]]]:
+    """
+    Geometry in dots: ({page_w, page_h, left, content_w, dpi},
+    [(field number, LineSpec, x per bold pass, top y, height)] per shown line).
+    """
+    dpi = int((spec.raw.get("zpl") or {}).get("dpi", DEFAULT_DPI))
+
+    def dots_mm(v):
+        return int(round(float(v) * dpi / 25.4))
+
+    def dots_pt(v):
+        return int(round(float(v) * dpi / 72.0))
+
+    m = spec.margins
+    page_w, page_h = dots_mm(spec.page_w_mm), dots_mm(spec.page_h_mm)
+    left, top = dots_mm(m["left"]), dots_mm(m["top"])
+    content_w = page_w - left - dots_mm(m["right"])
+    content_h = page_h - top - dots_mm(m["bottom"])
+
+    # whole dots per line, so rounding never drifts down the stack
+    sizes = [dots_pt(ln.size_pt) for ln in spec.lines]
+    gap = dots_pt(LINE_GAP_PT)
+    y = top + (content_h - (sum(sizes) + gap * 3)) // 2
+
+    rows = []
+    for ln, h in zip(spec.lines, sizes):
+        if ln.show:
+            passes = [0, max(1, h // 30)] if ln.bold else [0]
+            rows.append((len(rows) + 1, ln, [left + dx for dx in passes], y, h))
+        y += h + gap
+    geo = {"page_w": page_w, "page_h": page_h, "left": left, "content_w": content_w, "dpi": dpi}
+    return geo, rows
+
+def _field(x: int, y: int, h: int, content_w: int) -> str:
+    return f"^FO{x},{y}^A0N,{h},{h}^FB{content_w},1,0,C"
+
+def compile_format(cfg) -> Tuple[str, List[Tuple[int, str]]]:
+    """
+    label_config.yaml (path, dict or LabelSpec) -> (^DF stored-format ZPL, [(field number, field name)]).
+    Same geometry as the PDF renderer: page = label size, margins, lines
+    stacked and centred in the content box with 2pt gaps, centred text,
+    bold drawn as a second pass offset by a dot or two.
+    """
+    geo, rows = _layout(load_spec(cfg))
+    out = ["^XA", f"^DF{FORMAT_NAME}^FS", "^CI28", f"^PW{geo['page_w']}", f"^LL{geo['page_h']}", "^LH0,0"]
+    fields: List[Tuple[int, str]] = []
+    for fn, ln, xs, y, h in rows:
+        fields.append((fn, ln.field))
+        for x in xs:
+            out.append(f"{_field(x, y, h, geo['content_w'])}^FN{fn}^FS")
+    out.append("^XZ")
+    return "\n".join(out) + "\n", fields
+
+def _fitter(spec, rows, dpi):
+    """
+    fit(fn, value) -> fitted height in dots for shrink-to-fit lines
+    (LineSpec.min_size_pt), same point sizes as the PDF/DOCX renderers.
+    Text that cannot overflow even at 1em per character skips the font
+    metrics, so short labels never load reportlab.
+    """
+    shrink = {fn: ln for fn, ln, _, _, _ in rows if ln.min_size_pt is not None}
+    fit_w = spec.fit_w_pt
+    fonts: List[str] = []
+
+    def fit(fn, h, value):
+        ln = shrink.get(fn)
+        if ln is None or len(value) * ln.size_pt <= fit_w:
+            return h
+        from .textfit import fit_size
+        if not fonts:
+            fonts.extend(spec.fonts())
+        size = fit_size(value, fonts[1] if ln.bold else fonts[0], ln.size_pt, fit_w, ln.min_size_pt)
+        return h if size == ln.size_pt else int(round(size * dpi / 72.0))
+    return fit
+
+def _merged_runs(labels: Iterable[Any]) -> Iterator[Tuple[Tuple[str, ...], int]]:
+    # consecutive identical labels (e.g. a plain dict list) become one ^PQ run
+    key, count = None, 0
+    for lab, copies in iter_runs(labels):
+        k = tuple(lab.get(f, "") for f in FIELDS)
+        if k == key:
+            count += copies
+            continue
+        if key is not None:
+            yield key, count
+        key, count = k, copies
+    if key is not None:
+        yield key, count
+
+def build_zpl_flow(labels, config_path, out_zpl):
+    """
+    ZPL job: the stored format once, then one ^XF recall per run of
+    identical labels carrying only the field values and ^PQ <copies>.
+    A value that shrink-to-fit scales down is drawn as its own field at the
+    fitted height (same bottom edge) and its stored field is left empty.
+    labels: label dicts, Labels or a LabelBatch.
+    """
+    spec = load_spec(config_path)
+    fmt, _ = compile_format(spec)
+    geo, rows = _layout(spec)
+    fit = _fitter(spec, rows, geo["dpi"])
+    with open(out_zpl, "w", encoding="utf-8", newline="\n") as f:
+        f.write(fmt)
+        for key, copies in _merged_runs(labels):
+            values = dict(zip(FIELDS, key))
+            parts = [f"^XA^XF{FORMAT_NAME}^FS^CI28"]
+            for fn, ln, xs, y, h in rows:
+                value = _escape(values[ln.field])
+                fitted = fit(fn, h, values[ln.field])
+                if fitted == h:
+                    parts.append(f"^FN{fn}^FH_^FD{value}^FS")
+                    continue
+                parts.append(f"^FN{fn}^FD^FS")
+                for x in xs:
+                    parts.append(f"{_field(x, y + h - fitted, fitted, geo['content_w'])}^FH_^FD{value}^FS")
+            parts.append(f"^PQ{copies}^XZ\n")
+            f.write("".join(parts))
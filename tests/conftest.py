@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the package lives in src/ and is not installed: make it importable from any cwd
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,78 @@
+import os
+import re
+
+import reportlab
+from pypdf import PdfReader
+
+from sticker_maker.labels import Label
+from sticker_maker.mappings import ROOT
+from sticker_maker.pdfout import build_pdf_flow
+from sticker_maker.rendercache import RenderCache, build_pdf_cached
+
+CONFIG = str(ROOT / "templates" / "label_config.yaml")
+
+def _labels(n=200):
+    return [Label("TSR", "21.10.2025.", f"SOBA {i % 40}", f"CF{i:04d}A", 1 + (i % 7 == 0))
+            for i in range(n)]
+
+def _texts(path):
+    return [page.extract_text() for page in PdfReader(path).pages]
+
+def _ttf_config(tmp_path):
+    # the shipped config with reportlab's bundled Vera fonts embedded
+    fonts = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+    text = open(CONFIG, encoding="utf-8").read().replace(
+        "  font_name: Times New Roman\n",
+        "  font_name: Times New Roman\n"
+        f"  font_files: {{ regular: {fonts}/Vera.ttf, bold: {fonts}/VeraBd.ttf }}\n")
+    path = tmp_path / "ttf.yaml"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_warm_cache_matches_plain_render(tmp_path):
+    labels, cache = _labels(), RenderCache(str(tmp_path / "cache"))
+    build_pdf_flow(labels, CONFIG, str(tmp_path / "plain.pdf"))
+    cold = build_pdf_cached(labels, CONFIG, str(tmp_path / "cold.pdf"), cache)
+    warm = build_pdf_cached(labels, CONFIG, str(tmp_path / "warm.pdf"), cache)
+    assert cold["misses"] == cold["segments"] > 1
+    assert warm["hits"] == warm["segments"] and warm["pages_rendered"] == 0
+    plain = _texts(str(tmp_path / "plain.pdf"))
+    assert _texts(str(tmp_path / "cold.pdf")) == plain
+    assert _texts(str(tmp_path / "warm.pdf")) == plain
+
+def test_one_label_edit_rerenders_one_segment(tmp_path):
+    labels, cache = _labels(), RenderCache(str(tmp_path / "cache"))
+    build_pdf_cached(labels, CONFIG, str(tmp_path / "a.pdf"), cache)
+    labels[100] = Label("TSR", "21.10.2025.", "SOBA 99", "EDITED")
+    stats = build_pdf_cached(labels, CONFIG, str(tmp_path / "b.pdf"), cache)
+    assert stats["misses"] == 1 and stats["hits"] == stats["segments"] - 1
+    build_pdf_flow(labels, CONFIG, str(tmp_path / "plain.pdf"))
+    assert _texts(str(tmp_path / "b.pdf")) == _texts(str(tmp_path / "plain.pdf"))
+
+def test_damaged_entries_are_rendered_again(tmp_path):
+    labels, cache = _labels(), RenderCache(str(tmp_path / "cache"))
+    first = build_pdf_cached(labels, CONFIG, str(tmp_path / "a.pdf"), cache)
+    entries = sorted(cache.dir.glob("*.pdf"))
+    for i, p in enumerate(entries):
+        data = p.read_bytes()
+        if i % 2:
+            data = data[:data.rfind(b"startxref") + 10]   # truncated after startxref
+        else:
+            data = re.sub(rb"/Root \d+ 0 R", b"/Root 9999 0 R", data)  # catalog missing
+        p.write_bytes(data)
+    stats = build_pdf_cached(labels, CONFIG, str(tmp_path / "b.pdf"), cache)
+    assert "fallback" not in stats and stats["misses"] == first["segments"]
+    assert _texts(str(tmp_path / "b.pdf")) == _texts(str(tmp_path / "a.pdf"))
+
+def test_ttf_subsets_stay_distinct_and_programs_are_shared(tmp_path):
+    config, cache = _ttf_config(tmp_path), RenderCache(str(tmp_path / "cache"))
+    stats = build_pdf_cached(_labels(), config, str(tmp_path / "out.pdf"), cache)
+    assert "fallback" not in stats and stats["segments"] > 1
+    data = (tmp_path / "out.pdf").read_bytes()
+    names = re.findall(rb"/BaseFont /([A-Z]{6}\+\S+)", data)
+    assert len(names) == 2 * stats["segments"] and len(set(names)) == len(names)
+    assert sorted(names) == sorted(re.findall(rb"/FontName /([A-Z]{6}\+\S+)", data))
+    # the labels share their characters, so each font program is embedded once
+    assert data.count(b"/Length1") == 2
+    build_pdf_flow(_labels(), config, str(tmp_path / "plain.pdf"))
+    assert _texts(str(tmp_path / "out.pdf")) == _texts(str(tmp_path / "plain.pdf"))
@@ -0,0 +1,38 @@
+from sticker_maker.mappings import ROOT
+from sticker_maker.spooler import FakePrinter, count_zpl_labels, spool_file
+from sticker_maker.zplout import build_zpl_flow
+
+CONFIG = str(ROOT / "templates" / "label_config.yaml")
+
+def _job(tmp_path, n=300):
+    labels = [{"line1": "TSR", "line2": "21.10.2025.", "line3": f"SOBA {i}", "line4": f"CF{i:03d}A"}
+              for i in range(n)]
+    path = str(tmp_path / "stickers.zpl")
+    build_zpl_flow(labels, CONFIG, path)
+    return path, n
+
+def test_dropped_connection_is_retried_or_reported(tmp_path):
+    path, total = _job(tmp_path)
+    with FakePrinter() as ok, FakePrinter(drop_after=300) as flaky:
+        report = spool_file(path, [ok.address, flaky.address], batch_bytes=512, backoff=0.01)
+        received = count_zpl_labels(ok.data) + count_zpl_labels(flaky.data)
+    assert report["retries"] > 0 or report.get("unsent_labels")
+    # labels credited to a printer were really received by it
+    for fp in (ok, flaky):
+        credited = report["printers"].get(f"{fp.address[0]}:{fp.address[1]}", {}).get("labels", 0)
+        assert count_zpl_labels(fp.data) >= credited
+    assert received + report.get("unsent_labels", 0) >= total
+
+def test_late_drop_resends_at_most_one_window(tmp_path):
+    path, total = _job(tmp_path, n=2000)
+    window = 4096
+    with FakePrinter(drop_after=1000, drop_on=5) as fp:
+        report = spool_file(path, [fp.address], batch_bytes=512, confirm_bytes=window, backoff=0.01)
+        received = count_zpl_labels(fp.data)
+    assert report["labels"] == total and not report.get("unsent_labels")
+    assert report["retries"] == 1
+    # only the dropped window goes out twice, and the report says how much
+    assert 0 < report["resent_labels"]
+    assert total <= received <= total + report["resent_labels"]
+    label_bytes = min(len(b) for b in fp.data.split(b"^XZ") if b"^XA" in b)
+    assert report["resent_labels"] <= (window + 512) // label_bytes + 1